@@ -1,17 +1,19 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go # Required for adding the custom text layer
-from jira_loader import fetch_jira_issues
-from data_loading import save_data, load_data
+from data_loading import snapshot_version
+from sync import background_sync, start_background_sync
+from data_transformation import NON_SCALAR_COLUMNS, TEXT_COLUMNS, TICKET_COLUMNS
+from snapshot import open_snapshot
+import queries
+import metrics
+from metrics import timed
+import duckdb
 from styles import CUSTOM_CSS
 from datetime import datetime, timezone, timedelta, time
 import pytz
-from data_transformation import load_issues, upsert_jira_data, load_issues_Amparex
-from plotting import apply_font
-from st_aggrid import AgGrid, GridOptionsBuilder
-import pygwalker as pg
-from pygwalker.api.streamlit import StreamlitRenderer, init_streamlit_comm
+from plotting import (
+    aggregate, categories_figure, customers_figure, open_status_figure, overview_figure, resolution_bins_figure,
+    resolution_figure, sources_figure, subcategories_figure,
+)
 import os
 import hmac
 
@@ -57,16 +59,18 @@ st.sidebar.header("\n\nJIRA Data Analysis")
 # Require password before showing any data/controls (set UI_PASSWORD to enable).
 require_password()
 
+
+@st.cache_resource(max_entries=1)
+def shared_tickets(version):
+    # one read-only, memory-mapped ticket table per process, shared by all sessions;
+    # a refresh publishes a new version, which replaces this entry
+    return open_snapshot(version)
+
+
 st.sidebar.subheader("Data Controls")
 # add horizontal radio buttons to toggle between Ipro, Amparex and both
 firma = st.sidebar.radio("Firma", ["Ipro", "Amparex", "Beide"], horizontal=True)
-
-try:
-    df_old = load_data()
-    df = df_old.copy()
-except:
-    df = pd.DataFrame()
-    df_old = pd.DataFrame()
+firmas = {"Ipro": ["IPRO"], "Amparex": ["Amparex"], "Beide": None}[firma]
 
 # Optional global filters in sidebar
 start_date = datetime.now(timezone.utc) - timedelta(days=7)
@@ -78,6 +82,9 @@ tz = pytz.UTC
 start_dt = tz.localize(datetime.combine(start_date, time.min))
 end_dt   = tz.localize(datetime.combine(end_date,   time.max))
 
+# full-text search over summary, description and comments; filters every view
+search = st.sidebar.text_input("Suche (Zusammenfassung, Beschreibung, Kommentare)", key="search").strip()
+
 # toggle to switch between week_string and created_string
 if st.sidebar.toggle("Auf Wochenbasis"):
     x_axis = 'week_string'
@@ -87,252 +94,127 @@ else:
     x_axis_label = 'Datum'
 
 st.sidebar.write("JIRA Daten aktualisieren.")
+# incremental: only pull issues updated since the last sync (per-project watermark)
+incremental = st.sidebar.toggle("Nur Änderungen seit letztem Abruf", value=True)
 
 if st.sidebar.button("🔄 aktualisieren"):
+    # the sync (sync.py) runs on a thread of the server process; this and every other
+    # session keep working on the current snapshot until the new one is published
+    start_background_sync(incremental=incremental, start_dt=start_dt, end_dt=end_dt)
     st.sidebar.success("Fetch triggered!")
-    issues_ipro = fetch_jira_issues(start_dt, end_dt, max_issues=10000, project="SDIPR")
-    issues_amparex = fetch_jira_issues(start_dt, end_dt, max_issues=10000, project="SDAX")
-    if issues_ipro is None or issues_amparex is None:
-        st.sidebar.warning("No JIRA data found — please refresh using sidebar.")
-        st.stop()
+
+
+def sync_status(polling):
+    # progress of the background sync; polls while it runs and reruns the whole app
+    # once it has finished, so the views switch to the new snapshot
+    job = background_sync()
+    if job is None:
+        return
+    if job.running:
+        p = job.progress
+        if p["stage"] == "upsert":
+            st.info(f"Sync running: saving {p['issues']} fetched tickets ...")
+        else:
+            st.info(f"Sync running: {p['pages']} pages fetched, {p['issues']} tickets transformed.")
+        if st.button("Abbrechen", key="sync_cancel"):
+            job.cancel.set()
+        return
+    if polling:
+        st.rerun()
+    finished = f"{job.finished:%H:%M:%S} UTC"
+    if job.state == "done" and job.result[1] == 0:
+        st.info(f"{finished}: No new or changed tickets found ({job.result[0]} fetched).")
+    elif job.state == "done":
+        st.success(f"{finished}: {job.result[0]} tickets fetched, {job.result[1]} tickets changed.")
+    elif job.state == "skipped":
+        st.info(f"{finished}: Another sync was already running, its data is shown once it is done.")
+    elif job.state == "cancelled":
+        st.warning(f"{finished}: Sync cancelled, no data was changed.")
     else:
-        st.sidebar.success(f"JIRA data fetched successfully! {len(issues_ipro)+len(issues_amparex)} tickets fetched.")
-    df_new_ipro = load_issues(issues_ipro)
-    df_new_amparex = load_issues_Amparex(issues_amparex)
-    # st.sidebar.success(f"Data transformed successfully! New {len(df_new_ipro)} tickets loaded for Ipro and {len(df_new_amparex)} tickets loaded for Amparex.")
-    df_combined = pd.concat([df_new_ipro, df_new_amparex])
-    df = upsert_jira_data(df_old, df_combined)
-    save_data(df)
-    st.sidebar.success(f"Data upserted successfully! Overall {len(df)} tickets loaded.")
-
-if df is None:
-    st.warning("No JIRA data found — please refresh using sidebar.")
-    st.stop()
-else:
-    # Filter dataframe by date range
-    df = df[(df['created'] >= start_dt) & (df['created'] <= end_dt)]
-    st.sidebar.success(f"Data filtered successfully! {len(df)} tickets loaded.")
+        st.error(f"{finished}: Sync failed: {job.error!r}")
 
 
+job = background_sync()
+polling = job is not None and job.running
+with st.sidebar:
+    st.fragment(sync_status, run_every=1 if polling else None)(polling)
 
-if firma == "Ipro":
-    df = df[df['firma'] == "IPRO"]
-elif firma == "Amparex":
-    df = df[df['firma'] == "Amparex"]
+# the charts are aggregated by DuckDB on the daily rollups of the selected
+# window and firma; only the raw and interactive views load the ticket rows
+# dataset version: changes with every upsert and keys the shared table and the caches
+version = snapshot_version()
+n_tickets = queries.ticket_count(start_dt, end_dt, firmas, version=version)
+if n_tickets == 0:
+    st.warning("No JIRA data found — please refresh using sidebar.")
+    st.stop()
 else:
-    pass
-df_raw = df.copy()
+    st.sidebar.success(f"Data filtered successfully! {n_tickets} tickets loaded.")
+if search:
+    n_found = aggregate('ticket_count', version, start_dt, end_dt, firmas, search=search)
+    st.sidebar.info(f"Search: {n_found} of {n_tickets} tickets match.")
+    if n_found == 0:
+        st.info(f"No tickets match the search \"{search}\" in the selected window.")
+        st.stop()
 
 plot_height = 900
 plot_width = 1500
-# Tabs
-tab_overview, tab_categories, tab_subcategories, tab_sources, tab_status, tab_cycle_time, tab_resolution_time, tab_customer_tickets, tab_raw, tab_interactive = st.tabs([
-    "📊 Überblick",
-    "📊 Kategorien",
-    "📊 Unterkategorien",
-    "📊 Quellen",
-    "📊 Offene Tickets nach Status",
-    "⏱️ Ticketbearbeitungszeit",
-    "📈 Erstlösequote",
-    "📚 Tickets pro Kunde",
-    "📄 Rohdaten",
-    "📄 Interaktiv"
-])
+
+
+def show_figure(fig):
+    # the figure functions return None for a window without matching tickets
+    if fig is None:
+        st.info("Keine Daten für diese Auswahl.")
+    else:
+        st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
 
 
 # -------------------------------
-# Tab 1 – Overview
+# View 1 – Overview
 # -------------------------------
-with tab_overview:
+def view_overview():
     st.header("📊 Überblick")
 
-    # 1. Prepare the Data
-    result = df[[x_axis, 'status', 'key']].groupby([x_axis, 'status']).count().reset_index()
-
-    # Calculate percentages
-    total_per_group = result.groupby(x_axis)['key'].transform('sum')
-    result['percentage'] = result['key'] / total_per_group
-
-    # Create custom label
-    result['custom_label'] = result.apply(
-        lambda x: f"{x['key']} ({x['percentage']:.0%})", axis=1
-    )
-
-    # --- NEW: Define Order Logic ---
-    # Get all unique statuses
-    status_order = result['status'].unique().tolist()
-
-    # If "Fertig" exists, move it to the front of the list (Index 0 = Bottom of stack)
-    target_status = "Fertig"
-    if target_status in status_order:
-        status_order.remove(target_status)
-        status_order.insert(0, target_status)
-    # -------------------------------
-
-    # 2. Add Toggle
     mode = st.radio(
         "Ansicht wählen:",
         ["Absolute Zahlen", "Relativ (%)"],
         horizontal=True,
-        index=0 
+        index=0
     )
-
-    # 3. Configure Axis Variables
-    if mode == "Absolute Zahlen":
-        y_col = 'key'
-        y_title = 'Anzahl Tickets'
-        y_format = None
-    else:
-        y_col = 'percentage'
-        y_title = 'Prozentualer Anteil'
-        y_format = '.0%' 
-
-    # 4. Plot with Category Order
-    fig = px.bar(
-        result, 
-        x=x_axis, 
-        y=y_col, 
-        text='custom_label', 
-        color='status',
-        # Apply the forced order here
-        category_orders={'status': status_order} 
-    )
-
-    fig.update_xaxes(title_text=x_axis_label)
-    fig.update_yaxes(title_text=y_title, tickformat=y_format)
-    fig = apply_font(fig)
-
-    st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
+    fig = overview_figure(version, start_dt, end_dt, firmas, x_axis, x_axis_label, mode, search=search)
+    show_figure(fig)
 
 # -------------------------------
-# Tab 2 – Categories Breakdown
+# View 2 – Categories Breakdown
 # -------------------------------
-with tab_categories:
+def view_categories():
     st.header("📊 Aufteilung Kategorien")
 
-    # 1. Prepare Data
-    result = df[['Hauptkategorie','resolution','key']].groupby(['Hauptkategorie','resolution']).count().reset_index()
-    result = result.rename(columns={'key': 'Anzahl'})
-
-    # Calculate Totals & Percentages
-    total_per_group = result.groupby('Hauptkategorie')['Anzahl'].transform('sum')
-    result['percentage'] = result['Anzahl'] / total_per_group
-
-    result['custom_label'] = result.apply(
-        lambda x: f"{x['Anzahl']}<br>({x['percentage']:.0%})", axis=1
-    )
-
-    # 2. Define Sorting
-    category_totals = result.groupby('Hauptkategorie')['Anzahl'].sum().reset_index()
-    category_totals = category_totals.sort_values('Anzahl', ascending=False)
-    sorted_categories = category_totals['Hauptkategorie'].tolist()
-
-    resolution_order = result['resolution'].unique().tolist()
-    if "Same day" in resolution_order:
-        resolution_order.remove("Same day")
-        resolution_order.insert(0, "Same day")
-
-    # 3. Add Toggle
     mode_cat = st.radio(
         "Ansicht wählen:",
         ["Absolute Zahlen", "Relativ (%)"],
         horizontal=True,
         index=0,
-        key="toggle_categories" 
+        key="toggle_categories"
     )
-
-    # 4. Configure Axis
-    if mode_cat == "Absolute Zahlen":
-        y_col = 'Anzahl'
-        y_title = 'Anzahl Tickets'
-        y_format = None
-        y_text_pos = category_totals['Anzahl']
-        text_content = category_totals['Anzahl'].astype(str)
-        y_max = category_totals['Anzahl'].max() * 1.15 
-    else:
-        y_col = 'percentage'
-        y_title = 'Prozentualer Anteil'
-        y_format = '.0%'
-        y_text_pos = [1] * len(category_totals)
-        text_content = category_totals['Anzahl'].apply(lambda x: f"Total: {x}")
-        y_max = 1.15
-
-    # 5. Plot Main Bars
-    fig = px.bar(
-        result, 
-        x='Hauptkategorie', 
-        y=y_col, 
-        color='resolution',
-        text='custom_label',
-        color_discrete_map={"Same day": "green", "> 1 day": "#FFD700"},
-        category_orders={'resolution': resolution_order, 'Hauptkategorie': sorted_categories}
-    )
-
-    # --- FIX STEP 1: Apply styling to the bars NOW, before adding the scatter trace ---
-    # This prevents 'apply_font' from trying to set bar properties on the scatter trace later
-    fig.update_traces(textposition='auto') 
-    fig = apply_font(fig) 
-
-    # --- FIX STEP 2: Add the Scatter Trace (Totals) AFTER styling ---
-    fig.add_trace(
-        go.Scatter(
-            x=category_totals['Hauptkategorie'],
-            y=y_text_pos,
-            text=text_content,
-            mode='text',
-            textposition='top center',
-            textfont=dict(size=14, color='black', weight='bold'),
-            showlegend=False,
-            hoverinfo='skip'
-        )
-    )
-
-    # Final Layout Updates
-    fig.update_yaxes(title_text=y_title, tickformat=y_format, range=[0, y_max])
-    
-    st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
+    fig = categories_figure(version, start_dt, end_dt, firmas, mode_cat, search=search)
+    show_figure(fig)
 
 # -------------------------------
-# Tab 3 – Categories Breakdown
+# View 3 – Categories Breakdown
 # -------------------------------
-with tab_subcategories:
+def view_subcategories():
     st.header("📊 Aufteilung Unterkategorien")
-    result = df[['Hauptkategorie','Unterkategorie','key']].groupby(['Hauptkategorie','Unterkategorie']).count().reset_index()
-    result = result.rename(columns={'key': 'Anzahl'})
-    # sort by overall count
-    result = result.sort_values('Anzahl', ascending=False)
-
-    fig = px.bar(result, x='Hauptkategorie', y='Anzahl', color='Unterkategorie')
-    fig = apply_font(fig)
-    st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
+    fig = subcategories_figure(version, start_dt, end_dt, firmas, search=search)
+    show_figure(fig)
 
 
 # -------------------------------
-# Tab 3 – Sources Breakdown
+# View 3 – Sources Breakdown
 # -------------------------------
 
-with tab_sources:
+def view_sources():
     st.header("📊 Aufteilung Quellen")
 
-    # 1. Prepare Data
-    # Filter out empty request types and group
-    result = df[df['request_type']!=''][['request_type', x_axis, 'key']].groupby(['request_type', x_axis]).count().reset_index()
-
-    # Calculate Totals & Percentages per x-axis group
-    # We group by x_axis to get the total stack height for each column
-    total_per_group = result.groupby(x_axis)['key'].transform('sum')
-    result['percentage'] = result['key'] / total_per_group
-
-    # Create Custom Label: "Count <br> (Percentage%)"
-    result['custom_label'] = result.apply(
-        lambda x: f"{x['key']}({x['percentage']:.0%})", axis=1
-    )
-
-    # 2. Calculate Totals for Top Labels
-    # Create a separate DataFrame for the totals that will sit on top of the bars
-    group_totals = result.groupby(x_axis)['key'].sum().reset_index()
-    
-    # 3. Add Toggle
     mode_source = st.radio(
         "Ansicht wählen:",
         ["Absolute Zahlen", "Relativ (%)"],
@@ -340,149 +222,74 @@ with tab_sources:
         index=0,
         key="toggle_sources"  # Unique key is required for Streamlit widgets
     )
-
-    # 4. Configure Axis and Top Labels based on toggle
-    if mode_source == "Absolute Zahlen":
-        y_col = 'key'
-        y_title = 'Anzahl Tickets'
-        y_format = None
-        
-        # Labels for top of bars
-        y_text_pos = group_totals['key']
-        text_content = group_totals['key'].astype(str)
-        # Add 15% buffer to Y-axis max so labels fit
-        y_max = group_totals['key'].max() * 1.15
-    else:
-        y_col = 'percentage'
-        y_title = 'Prozentualer Anteil'
-        y_format = '.0%'
-        
-        # Labels for top of bars (always at 100%)
-        y_text_pos = [1] * len(group_totals)
-        # Show "Total: N" so context isn't lost in percent mode
-        text_content = group_totals['key'].apply(lambda x: f"Total: {x}")
-        y_max = 1.15
-
-    # 5. Plot Main Bars
-    fig = px.bar(
-        result, 
-        x=x_axis, 
-        y=y_col, 
-        color='request_type',
-        text='custom_label'
-    )
-
-    # --- CRITICAL: Apply Bar Styling BEFORE adding Scatter trace ---
-    # This prevents the "Invalid property insidetextanchor" error
-    fig.update_traces(
-        textposition='inside',
-        insidetextanchor='middle'
-    )
-    fig = apply_font(fig)
-
-    # 6. Add Scatter Trace for Totals
-    fig.add_trace(
-        go.Scatter(
-            x=group_totals[x_axis],
-            y=y_text_pos,
-            text=text_content,
-            mode='text',
-            textposition='top center',
-            textfont=dict(size=12, color='black', weight='bold'),
-            showlegend=False,
-            hoverinfo='skip'
-        )
-    )
-
-    # 7. Final Layout Updates
-    fig.update_xaxes(title_text=x_axis_label)
-    fig.update_yaxes(title_text=y_title, tickformat=y_format, range=[0, y_max])
-    
-    st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
+    fig = sources_figure(version, start_dt, end_dt, firmas, x_axis, x_axis_label, mode_source, search=search)
+    show_figure(fig)
 
 # -------------------------------
-# Tab 4 – Status Breakdown
+# View 4 – Status Breakdown
 # -------------------------------
-with tab_status:
+def view_status():
     st.header("📊 Offene Tickets nach Status")
-    result = df[df['status_category']!='Fertig'][['status_category','status','key']].groupby(['status_category','status']).count().reset_index().sort_values('key', ascending=False)
-    result['status_key'] = result['status'] + ' (' + result['key'].astype(str) + ')'
-    # plot using plotly with status_category on x axis and status on y axis, show status and key values inside of bars
-    fig = px.bar(result, x='status_category', y='key', color='status', text='status_key')
-    # add labels inside of bars
-    fig.update_traces(
-        textposition='inside',
-        insidetextanchor='middle'
-    )
-    # add y axis label
-    fig.update_yaxes(title_text='Anzahl Tickets')
-    fig.update_xaxes(title_text='Statuskategorie')
-    #remove legend
-    fig.update_layout(showlegend=False)
-    # set fontsize of plot to 24
-    fig = apply_font(fig)
-
-    st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
+    fig = open_status_figure(version, start_dt, end_dt, firmas, search=search)
+    show_figure(fig)
     
 
 # -------------------------------
-# Tab 5 – Backlog Health
+# View 5 – Backlog Health
 # -------------------------------
-with tab_cycle_time:
+def view_cycle_time():
     st.header("⏱️ Ticketbearbeitungszeit (Fertige Tickets)")
-
-# plot time to resolution bin counts using plotly
-# sort by midpoint of intervals/bins
-    result = df[df['currentstatus_name'] == 'Fertig'][['time_to_resolution_bin','key']].groupby('time_to_resolution_bin').count().reset_index()
-    fig = px.bar(result,x='time_to_resolution_bin', y='key')
-    # add x axis label
-
-    fig.update_layout(
-        title='Anzahl Fertige Tickets nach Bearbeitungszeit',
-    )
-    fig.update_xaxes(title_text='Bearbeitungszeit in Stunden')
-    # add y axis label
-    fig.update_yaxes(title_text='Anzahl Fertige Tickets')
-    # set width of plot
-    fig.update_layout(width=1000)
-    fig = apply_font(fig)
-    st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
+    fig = resolution_bins_figure(version, start_dt, end_dt, firmas, search=search)
+    show_figure(fig)
 
 # -------------------------------
-# Tab 6 – Resolution Time
+# View 6 – Resolution Time
 # -------------------------------
-with tab_resolution_time:
+def view_resolution_time():
     st.header("📈 Erstlösequote")
-    result = df[df['status_category']=='Fertig'][[x_axis,'resolution','key']].groupby([x_axis,'resolution']).count().reset_index()
-    result = result.rename(columns={'key': 'Anzahl'})
-    fig = px.bar(result, x=x_axis, y='Anzahl', text='Anzahl', color='resolution')
-    fig.update_xaxes(title_text=x_axis_label)
-    fig.update_yaxes(title_text='Anzahl Fertige Tickets')
-    fig = apply_font(fig)
-    st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
+    fig = resolution_figure(version, start_dt, end_dt, firmas, x_axis, x_axis_label, search=search)
+    show_figure(fig)
 
 
 # -------------------------------
-# Tab 7 – Customer Tickets
+# View 7 – Customer Tickets
 # -------------------------------
-with tab_customer_tickets:
+def view_customer_tickets():
     st.header("📚 Anzahl Tickets pro Kunde")
-    result = df[df['status_category']=='Fertig'][['zentrale','key']].groupby(['zentrale']).count().reset_index()
-    result = result.rename(columns={'key': 'Anzahl'})
-    result = result.sort_values('Anzahl', ascending=False)
-    result = result.head(25)
-    fig = px.bar(result, x='zentrale', y='Anzahl', text='Anzahl')
-    fig = apply_font(fig)
-    st.plotly_chart(fig, use_container_width=False, height=plot_height, width=plot_width)
+    fig = customers_figure(version, start_dt, end_dt, firmas, limit=25, search=search)
+    show_figure(fig)
 
 # -------------------------------
-# Tab 8 – Raw Data
+# View 8 – Raw Data
 # -------------------------------
-with tab_raw:
-    df = df[['Link', *[col for col in df.columns if col != 'Link']]]
-    st.header("📄 Rohdaten")
+GRID_COLUMNS = ['Link', *[col for col in TICKET_COLUMNS if col != 'Link']]
+GRID_SORTABLE = [col for col in GRID_COLUMNS if col not in TEXT_COLUMNS]
+
 
-    st.dataframe(df,
+def view_raw():
+    st.header("📄 Rohdaten")
+    # filtering, sorting and paging run server-side; only the visible page is sent
+    col_filter, col_text, col_sort, col_order = st.columns(4)
+    filter_col = col_filter.selectbox("Filter Spalte", ["—", *GRID_SORTABLE], key="raw_filter_col")
+    filter_text = col_text.text_input("enthält", key="raw_filter_text")
+    sort_by = col_sort.selectbox("Sortieren nach", GRID_SORTABLE, index=GRID_SORTABLE.index('created'), key="raw_sort")
+    descending = col_order.toggle("Absteigend", value=True, key="raw_desc")
+    columns = st.multiselect("Spalten", GRID_COLUMNS, default=GRID_COLUMNS, key="raw_columns") or ['Link', 'key']
+    filters = ((filter_col, filter_text),) if filter_col != "—" and filter_text else ()
+
+    n_rows = aggregate('ticket_row_count', version, start_dt, end_dt, firmas, filters, search=search)
+    col_size, col_page, _ = st.columns([1, 1, 2])
+    page_size = col_size.selectbox("Zeilen pro Seite", [50, 100, 250, 500], index=1, key="raw_page_size")
+    n_pages = max(1, -(-n_rows // page_size))
+    # the page number may be out of range after the filters changed
+    st.session_state["raw_page"] = min(st.session_state.get("raw_page", 1), n_pages)
+    page = col_page.number_input("Seite", min_value=1, max_value=n_pages, key="raw_page")
+
+    result = aggregate('ticket_page', version, start_dt, end_dt, firmas, columns, sort_by, descending, filters,
+                       page - 1, page_size, search=search)
+    first = (page - 1) * page_size
+    st.caption(f"Zeilen {min(first + 1, n_rows)}–{first + len(result)} von {n_rows}")
+    st.dataframe(result,
         column_config={
         "Link": st.column_config.LinkColumn(
             "JIRA Link",
@@ -495,24 +302,96 @@ with tab_raw:
 
 
 # -------------------------------
-# Tab 9 – Interactive Data
+# View 9 – Interactive Data
 # -------------------------------
-with tab_interactive:
+# known scalar columns of the ticket table; lists/objects and the long texts are left out
+EXPLORER_COLUMNS = [col for col in GRID_COLUMNS if col not in NON_SCALAR_COLUMNS and col not in TEXT_COLUMNS]
+
+
+@st.cache_resource(max_entries=8)
+def explorer_renderer(version, start, end, firmas, search):
+    # one renderer per dataset version and window, shared by all sessions; pygwalker
+    # computes the charts server-side (kernel_computation), the browser only gets results.
+    # pygwalker takes seconds to import, so it is only loaded when the view is opened.
+    from pygwalker.api.streamlit import StreamlitRenderer
+
+    window = queries.search_window(shared_tickets(version), start, end, firmas, search)
+    df = window.select(EXPLORER_COLUMNS).to_pandas()
+    return StreamlitRenderer(df, kernel_computation=True)
+
+
+def view_interactive():
     st.header("📄 Interaktiv")
-    problem_cols = [
-    col for col in df.columns
-    if df[col].apply(lambda x: isinstance(x, (list, dict, set))).any()
-    ]
-    df = df.drop(columns=problem_cols)
-    # display dataframe with pygwalker
-    renderer = StreamlitRenderer(df)
-    renderer.explorer()
+    explorer_renderer(version, start_dt, end_dt, firmas, search).explorer()
+
+    st.subheader("SQL")
+    sql = st.text_area(
+        "Abfrage auf der Tabelle `tickets` (gewählter Zeitraum, Firma und Suche)",
+        value="SELECT status, count(*) AS Anzahl FROM tickets GROUP BY status ORDER BY Anzahl DESC",
+        key="explorer_sql",
+    )
+    if sql.strip():
+        try:
+            result = aggregate('explore_sql', version, start_dt, end_dt, firmas, sql, search=search)
+        except duckdb.Error as e:
+            st.error(f"SQL Fehler: {e}")
+        else:
+            st.caption(f"{len(result)} Zeilen (maximal {queries.EXPLORE_ROW_LIMIT})")
+            st.dataframe(result, hide_index=True)
 
-    st.write("\n\n\n\n\n\n")
 
-    gb = GridOptionsBuilder.from_dataframe(df)
-    gb.configure_default_column(filter=True, sortable=True)
-    grid_options = gb.build()
+# -------------------------------
+# View 10 – Search results
+# -------------------------------
+SEARCH_COLUMNS = ['Link', 'key', 'summary', 'status', 'created', 'firma', 'Hauptkategorie', 'Unterkategorie']
+SEARCH_RESULT_LIMIT = 200
+
+
+def view_search():
+    st.header("🔎 Suche")
+    if not search:
+        st.info("Suchbegriff in der Seitenleiste eingeben.")
+        return
+    # best matches first (BM25); tickets contain all words of the search
+    result = aggregate('search_results', version, start_dt, end_dt, firmas, search, SEARCH_COLUMNS,
+                       SEARCH_RESULT_LIMIT)
+    st.caption(f"{len(result)} Treffer (maximal {SEARCH_RESULT_LIMIT}), beste zuerst")
+    st.dataframe(result,
+        column_config={
+        "Link": st.column_config.LinkColumn(
+            "JIRA Link",
+            display_text="Open in JIRA"
+        ),
+        "score": st.column_config.NumberColumn("Relevanz", format="%.2f"),
+    },
+    hide_index=True,
+    height=plot_height,
+    )
 
-    AgGrid(df, gridOptions=grid_options, height=plot_height, width=plot_width)
 
+# Only the selected view is computed and sent to the browser; the others run
+# when they are selected.
+VIEWS = {
+    "📊 Überblick": view_overview,
+    "📊 Kategorien": view_categories,
+    "📊 Unterkategorien": view_subcategories,
+    "📊 Quellen": view_sources,
+    "📊 Offene Tickets nach Status": view_status,
+    "⏱️ Ticketbearbeitungszeit": view_cycle_time,
+    "📈 Erstlösequote": view_resolution_time,
+    "📚 Tickets pro Kunde": view_customer_tickets,
+    "📄 Rohdaten": view_raw,
+    "📄 Interaktiv": view_interactive,
+    "🔎 Suche": view_search,
+}
+view = st.radio("Ansicht", list(VIEWS), horizontal=True, key="view", label_visibility="collapsed")
+with timed(f"view.{VIEWS[view].__name__.removeprefix('view_')}"):
+    VIEWS[view]()
+
+# optional performance panel for admins (METRICS_PANEL=1); the timings are per process
+if os.getenv("METRICS_PANEL"):
+    with st.sidebar.expander("⏱️ Performance"):
+        st.dataframe(metrics.summary(), hide_index=True)
+        st.download_button("Prometheus", metrics.prometheus_text(), file_name="metrics.prom")
+        st.download_button("JSONL", metrics.to_jsonl(), file_name="metrics.jsonl")
+metrics.write_prometheus()
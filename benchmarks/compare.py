@@ -0,0 +1,61 @@
+"""
+Compare two benchmark reports of benchmarks/run.py stage by stage.
+
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+    python -m benchmarks.compare before.json after.json --threshold 0.2
+
+Stages that got slower than `threshold` (relative, on the fastest run) are marked
+and make the command exit with status 1.
+"""
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+
+def load_report(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], pd.DataFrame(report["results"])
+
+
+def _label(meta):
+    return f"{meta['commit']}{'+' if meta.get('dirty') else ''}"
+
+
+def compare(before, after):
+    """Both reports joined on (size, stage), with the time ratio after / before."""
+    df = before.merge(after, on=["size", "stage"], how="outer", suffixes=("_before", "_after"))
+    df["ratio"] = df["seconds_min_after"] / df["seconds_min_before"]
+    df["rss_mib_before"] = df["peak_rss_delta_before"] / 2**20
+    df["rss_mib_after"] = df["peak_rss_delta_after"] / 2**20
+    return df[["size", "stage", "seconds_min_before", "seconds_min_after", "ratio", "rss_mib_before", "rss_mib_after"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    meta_before, before = load_report(args.before)
+    meta_after, after = load_report(args.after)
+    print(f"before: {_label(meta_before)} {meta_before.get('subject', '')}")
+    print(f"after:  {_label(meta_after)} {meta_after.get('subject', '')}")
+    if meta_before.get("versions") != meta_after.get("versions") or meta_before.get("cpus") != meta_after.get("cpus"):
+        print("note: the reports were run with different library versions or CPU counts")
+
+    df = compare(before, after)
+    regressions = df["ratio"] > 1 + args.threshold
+    df[""] = regressions.map({True: "slower", False: ""})
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.float_format", "{:.4f}".format):
+        print(df.to_string(index=False))
+    if regressions.any():
+        print(f"{int(regressions.sum())} stages slower by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
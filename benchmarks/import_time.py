@@ -0,0 +1,77 @@
+"""
+Import-time budget of the dashboard: imports the modules app.py imports in a fresh
+interpreter with `python -X importtime` and checks that
+  - their imports together stay within the budget (seconds, cumulative), and
+  - the heavy libraries that are only needed on first use (Jira client, pygwalker)
+    are not imported at all.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget 3 --top 20
+
+Exits with status 1 if the budget is exceeded or a lazy library was imported.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# the modules app.py imports, i.e. what every process start pays before the first page
+APP_IMPORTS = [
+    "streamlit", "data_loading", "sync", "data_transformation", "snapshot", "queries", "metrics", "duckdb",
+    "styles", "pytz", "plotting",
+]
+# imported on first use only
+LAZY_MODULES = ["jira", "pygwalker"]
+IMPORT_BUDGET_S = 2.5
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(modules):
+    """
+    (module, self seconds, cumulative seconds, nesting level) of every import done
+    while importing `modules`, and the set of imported module names.
+    """
+    code = (
+        f"import sys\nfor m in {modules!r}: __import__(m)\n"
+        "sys.stdout.write('\\n'.join(sorted(sys.modules)))"
+    )
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                          cwd=REPO_DIR, check=True)
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, level))
+    return entries, set(proc.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the dashboard modules.")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_S, help="seconds for all app imports")
+    parser.add_argument("--top", type=int, default=15, help="number of heaviest imports to list")
+    args = parser.parse_args()
+
+    entries, imported = import_times(APP_IMPORTS)
+    # top-level entries are the imports done directly, their cumulative times add up to the total
+    total = sum(cumulative for _, _, cumulative, level in entries if level == 0)
+
+    print(f"{'module':<50} {'self s':>8} {'cumul. s':>9}")
+    for name, own, cumulative, level in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"{name:<50} {own:8.3f} {cumulative:9.3f}")
+    print(f"\nApp imports: {total:.2f}s (budget {args.budget:.2f}s)")
+
+    failed = False
+    if total > args.budget:
+        print("Import time over budget")
+        failed = True
+    eager = [m for m in LAZY_MODULES if m in imported]
+    if eager:
+        print(f"Imported on start, should be imported on first use: {', '.join(eager)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Benchmarks of the fetch → transform → upsert → store → dashboard pipeline on
+synthetic Jira issues (see benchmarks/synthetic.py), half SDIPR and half SDAX.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 1k 10k 100k 1m --repeat 1
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+
+Per size, every stage is run `--repeat` times and reports its fastest and median
+duration, the peak RSS growth over the stage and the rows it returned:
+  transform.*   load_issues page by page (100 issues, as fetched) + concat_tickets
+  upsert.*      upsert_jira_data with 10% newer versions and 2% new issues
+  store.*       save_data of the whole table into an empty store (tickets, rollups,
+                search index and snapshot; the text is written untimed before),
+                load_data (all / 30-day window), upsert_data of the updates into
+                a fresh store, search index build
+  query.*       every dashboard aggregation for a 30-day window and for all data,
+                the raw grid page, the full-text search, the snapshot window and an
+                ad-hoc SQL query
+The store runs in a temporary directory. Each run writes one JSON report named
+after the commit to benchmarks/results/, so reports of two commits can be compared.
+1m issues need several GB of memory.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.synthetic import generate_issues, generate_updates
+from jira_loader import PROJECTS
+from metrics import rss_bytes
+
+PAGE_SIZE = 100
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+OBJECT_IDS_PATH = "data/object_id_to_name.json"
+
+
+def parse_size(text):
+    text = text.lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+class PeakRSS:
+    """Highest RSS growth over a block, sampled every few milliseconds in a thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes() - self.start)
+
+    def __enter__(self):
+        self.start = rss_bytes()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes() - self.start)
+
+
+def _rows(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    return len(result) if hasattr(result, "__len__") else None
+
+
+def measure(results, size, stage, fn, repeat, setup=None):
+    """
+    Run fn() `repeat` times, each after an untimed setup(), append its timings to
+    `results` and return its last result.
+    """
+    seconds = []
+    peak = 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            result = fn()
+            seconds.append(time.perf_counter() - start)
+        peak = max(peak, rss.peak)
+    results.append({
+        "size": size,
+        "stage": stage,
+        "seconds_min": min(seconds),
+        "seconds_median": statistics.median(seconds),
+        "repeat": repeat,
+        "peak_rss_delta": peak,
+        "rows": _rows(result),
+    })
+    print(f"{size:>9} {stage:<40} {min(seconds):9.4f}s {peak / 2**20:9.1f} MiB")
+    return result
+
+
+def synthetic_pages(size, seed=0):
+    """Pages of raw issues of both projects, as (firma, page)."""
+    for offset, (project, firma) in enumerate(PROJECTS.items()):
+        issues = generate_issues(size // len(PROJECTS), project=project, seed=seed + offset)
+        while page := list(islice(issues, PAGE_SIZE)):
+            yield firma, page
+
+
+def transform_pages(size, seed=0):
+    """load_issues per page + concat_tickets; the generation of the pages is not timed."""
+    from data_transformation import concat_tickets, load_issues
+
+    frames, busy = [], 0.0
+    for firma, page in synthetic_pages(size, seed):
+        start = time.perf_counter()
+        frames.append(load_issues(page, firma))
+        busy += time.perf_counter() - start
+    start = time.perf_counter()
+    df = concat_tickets(frames)
+    return df, busy + time.perf_counter() - start
+
+
+def synthetic_updates(size, seed=0):
+    """10% newer versions of stored issues and 2% new issues, transformed."""
+    from data_transformation import concat_tickets, load_issues
+
+    frames = []
+    for offset, (project, firma) in enumerate(PROJECTS.items()):
+        n = size // len(PROJECTS)
+        updates = list(generate_updates(generate_issues(n, project=project, seed=seed + offset), fraction=0.1))
+        new = list(generate_issues(max(1, n // 50), project=project, seed=seed + 100 + offset, first_id=200_000_000))
+        frames.append(load_issues(updates + new, firma))
+    return concat_tickets(frames)
+
+
+def bench_size(size, repeat, results):
+    # imported here: the modules read data/ relative to the (temporary) working directory
+    from data_loading import build_search_index, load_data, save_data, save_text, snapshot_version, upsert_data
+    from data_transformation import split_text_columns, upsert_jira_data
+    import queries
+    from snapshot import open_snapshot, window_table
+
+    # transform: timed inside, without the generation of the raw pages
+    timings = []
+    with PeakRSS() as rss:
+        for _ in range(repeat):
+            df, seconds = transform_pages(size)
+            timings.append(seconds)
+    results.append({
+        "size": size, "stage": "transform.load_issues_pages", "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings), "repeat": repeat, "peak_rss_delta": rss.peak, "rows": len(df),
+    })
+    print(f"{size:>9} {'transform.load_issues_pages':<40} {min(timings):9.4f}s {rss.peak / 2**20:9.1f} MiB")
+
+    df_updates = synthetic_updates(size)
+    measure(results, size, "upsert.upsert_jira_data", lambda: upsert_jira_data(df, df_updates), repeat)
+
+    def empty_store():
+        shutil.rmtree("data/store", ignore_errors=True)
+        shutil.rmtree("data/snapshot", ignore_errors=True)
+
+    def text_only_store():
+        # save_data indexes the text that is already stored
+        empty_store()
+        save_text(split_text_columns(df)[1])
+
+    def fresh_store():
+        empty_store()
+        upsert_data(df)
+
+    measure(results, size, "store.save_data_initial", lambda: save_data(df), repeat, setup=text_only_store)
+    end = df["created"].max()
+    start = end - pd.Timedelta(days=30)
+    measure(results, size, "store.load_data_all", load_data, repeat)
+    measure(results, size, "store.load_data_30d", lambda: load_data(start=start, end=end), repeat)
+
+    measure(results, size, "store.upsert_data_incremental", lambda: upsert_data(df_updates), repeat, setup=fresh_store)
+
+    def drop_search_index():
+        for table in ("search_terms", "search_docs"):
+            shutil.rmtree(os.path.join("data/store", table), ignore_errors=True)
+
+    measure(results, size, "store.search_index_build", build_search_index, repeat, setup=drop_search_index)
+
+    windows = {"30d": (start, end), "all": (None, None)}
+    for label, (first, last) in windows.items():
+        for name, args in [
+            ("ticket_count", ()),
+            ("status_counts", ("created_string",)),
+            ("status_counts_week", ("week_string",)),
+            ("category_resolution_counts", ()),
+            ("subcategory_counts", ()),
+            ("request_type_counts", ("created_string",)),
+            ("open_status_counts", ()),
+            ("resolution_bin_counts", ()),
+            ("resolution_counts", ("created_string",)),
+            ("top_customers", ()),
+        ]:
+            query = getattr(queries, name.removesuffix("_week"))
+            measure(results, size, f"query.{name}.{label}", lambda: query(first, last, None, *args), repeat)
+        measure(results, size, f"query.ticket_page.{label}",
+                lambda: queries.ticket_page(first, last, None, ['key', 'status', 'created', 'description'],
+                                            sort_by='updated'), repeat)
+        measure(results, size, f"query.search_tickets.{label}",
+                lambda: queries.search_tickets(first, last, None, "Kasse Drucker"), repeat)
+    tickets = open_snapshot(snapshot_version())
+    measure(results, size, "query.snapshot_window_30d", lambda: window_table(tickets, start, end, None), repeat)
+    measure(results, size, "query.explore_sql_30d",
+            lambda: queries.explore_sql(start, end, None, "SELECT status, count(*) AS n FROM tickets GROUP BY status"),
+            repeat)
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True, cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    return commit, dirty, git("log", "-1", "--format=%s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ticket pipeline on synthetic Jira issues.")
+    parser.add_argument("--sizes", nargs="+", default=["1k", "10k", "100k"], help="issue counts, e.g. 1k 10k 100k 1m")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=None, help="report path (default: benchmarks/results/<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    commit, dirty, subject = git_revision()
+    meta = {
+        "commit": commit,
+        "dirty": dirty,
+        "subject": subject,
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "versions": {"pandas": pd.__version__, "numpy": np.__version__, "pyarrow": pa.__version__,
+                     "duckdb": duckdb.__version__},
+        "repeat": args.repeat,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}-{meta['time'][:19].replace(':', '')}.json")
+    out = os.path.abspath(out)
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # the store and the snapshot are written relative to the working directory
+        os.makedirs(os.path.join(workdir, "data"))
+        shutil.copy(OBJECT_IDS_PATH, os.path.join(workdir, OBJECT_IDS_PATH))
+        os.chdir(workdir)
+        try:
+            for size in map(parse_size, args.sizes):
+                bench_size(size, args.repeat, results)
+        finally:
+            os.chdir(cwd)
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=1)
+    print(f"Report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
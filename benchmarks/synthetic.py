@@ -0,0 +1,125 @@
+"""
+Synthetic Jira issues shaped like the search API payloads the loader receives
+(fields as requested by ISSUE_FIELDS, or the full payload), with distributions
+close to the real SDIPR/SDAX data. Deterministic for a given seed.
+"""
+import json
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta, timezone
+
+# (status, status category, weight)
+STATUSES = [
+    ("Fertig", "Fertig", 80), ("Warten auf Support", "Zu erledigen", 9), ("In Bearbeitung", "In Arbeit", 3),
+    ("Warten auf Kunde", "In Arbeit", 2), ("In Arbeit", "In Arbeit", 1), ("Antwort von Fachabteilung", "In Arbeit", 1),
+    ("Frage an Fachabteilung", "In Arbeit", 1), ("Terminiert", "In Arbeit", 1), ("Warten auf Intern", "In Arbeit", 1),
+]
+REQUEST_TYPES = [
+    ("Allgemeine Anfrage", 74), (None, 13), ("Anfrage per E-Mail", 8), ("Anfrage per Voice-Mail", 3),
+    ("Ticket für Support erstellen (intern)", 1), ("Anfrage per Voice-Mail (AB)", 1),
+]
+SOURCES = [("Anruf", 86), (None, 13), ("Portal", 1)]
+PRIORITIES = [("Normal", 95), ("Hoch", 3), ("Sehr Hoch", 1), ("Rot", 1)]
+# hours from created to the current status date
+RESOLUTION_HOURS = [(0.001, 50), (0.3, 15), (1.5, 8), (5, 7), (20, 6), (40, 5), (100, 5), (300, 4)]
+WORDS = "Kasse Bondruck Drucker Filiale Lizenz Update Fehler Abrechnung Kunde Termin Export Schnittstelle".split()
+
+# Jira returns local times with their offset, e.g. 2025-12-08T09:15:02.000+0100
+JIRA_DATETIME = "%Y-%m-%dT%H:%M:%S.000%z"
+JIRA_TZ = timezone(timedelta(hours=1))
+SERVERS = {"SDIPR": "https://ipro.atlassian.net", "SDAX": "https://amparex.atlassian.net"}
+
+
+def _choice(rnd, weighted):
+    return rnd.choices([value for value, _ in weighted], [weight for _, weight in weighted])[0]
+
+
+def _text(rnd, words):
+    return " ".join(rnd.choice(WORDS) for _ in range(words))
+
+
+def _object_ids(path="data/object_id_to_name.json"):
+    with open(path) as f:
+        return list(json.load(f))
+
+
+def generate_issues(n, project="SDIPR", seed=0, start=datetime(2024, 1, 1, tzinfo=timezone.utc), days=365,
+                    first_id=100_000_000):
+    """Yield `n` synthetic issues of `project` created over `days` days from `start`."""
+    rnd = random.Random(seed)
+    object_ids = _object_ids()
+    # customers follow a long tail: a few zentralen open most of the tickets
+    zentralen = [str(rnd.randint(7_000, 12_000)) for _ in range(max(10, n // 3))]
+    zentrale_weights = list(accumulate(1 / (rank + 1) ** 0.7 for rank in range(len(zentralen))))
+    filialen = [str(rnd.randint(14_000, 220_000)) for _ in range(max(10, n // 7))]
+    server = SERVERS.get(project, "https://example.atlassian.net")
+    step = days * 86_400 / max(n, 1)
+
+    for i in range(n):
+        key = f"{project}-{first_id + i}"
+        created = (start + timedelta(seconds=i * step + rnd.random() * step)).astimezone(JIRA_TZ)
+        updated = created + timedelta(hours=rnd.expovariate(1 / 48))
+        status, category = _choice(rnd, [((s, c), w) for s, c, w in STATUSES])
+        request_type = _choice(rnd, REQUEST_TYPES)
+        fields = {
+            "summary": f"{_text(rnd, 4)} {i}",
+            "description": _text(rnd, rnd.randint(20, 150)) if rnd.random() < 0.9 else None,
+            "status": {"name": status, "statusCategory": {"name": category}},
+            "created": created.strftime(JIRA_DATETIME),
+            "updated": updated.strftime(JIRA_DATETIME),
+            "labels": ["prio"] if rnd.random() < 0.02 else [],
+            "priority": {"name": _choice(rnd, PRIORITIES)},
+            "issuetype": {"name": "Allgemeine Anfrage"},
+            "customfield_10065": None,
+            "comment": {
+                "comments": [{"body": _text(rnd, rnd.randint(5, 80))} for _ in range(rnd.choice([0, 0, 1, 2, 3, 5]))],
+                "maxResults": 0, "total": 0, "startAt": 0,
+            },
+            "issuelinks": [],
+            "customfield_10675": None,
+            "customfield_10679": [],
+            "customfield_10680": [],
+            "customfield_10673": None,
+            "customfield_10674": None,
+            "customfield_10010": None,
+        }
+        if request_type is not None:
+            status_date = created + timedelta(hours=_choice(rnd, RESOLUTION_HOURS) * (0.5 + rnd.random()))
+            fields["customfield_10010"] = {
+                "_links": {"agent": f"{server}/browse/{key}"},
+                "requestType": {"name": request_type},
+                "currentStatus": {
+                    "status": status,
+                    "statusCategory": "DONE" if category == "Fertig" else "INDETERMINATE",
+                    "statusDate": {"jira": status_date.strftime(JIRA_DATETIME)},
+                },
+            }
+        source = _choice(rnd, SOURCES)
+        if source is not None:
+            fields["customfield_10675"] = {"value": source}
+        if rnd.random() < 0.85:
+            fields["customfield_10680"] = [{"objectId": rnd.choice(object_ids), "workspaceId": "w"}]
+            if rnd.random() < 0.8:
+                fields["customfield_10679"] = [{"objectId": rnd.choice(object_ids), "workspaceId": "w"}]
+        if rnd.random() < 0.95:
+            zentrale = rnd.choices(zentralen, cum_weights=zentrale_weights)[0]
+            fields["customfield_10673"] = [{"objectId": zentrale, "workspaceId": "w"}]
+        if rnd.random() < 0.2:
+            fields["customfield_10674"] = [{"objectId": rnd.choice(filialen), "workspaceId": "w"}]
+        if rnd.random() < 0.05:
+            direction = rnd.choice(["outwardIssue", "inwardIssue"])
+            fields["issuelinks"] = [{"type": {"name": "Cloners"}, direction: {"key": f"{project}-{rnd.randint(1, first_id)}"}}]
+        yield {"id": str(first_id + i), "key": key, "fields": fields}
+
+
+def generate_updates(issues, fraction=0.1, seed=1, hours=24):
+    """Newer versions of a `fraction` of `issues` (status set to Fertig, updated later)."""
+    rnd = random.Random(seed)
+    for issue in issues:
+        if rnd.random() >= fraction:
+            continue
+        fields = dict(issue["fields"])
+        updated = datetime.strptime(fields["updated"], JIRA_DATETIME) + timedelta(hours=rnd.random() * hours)
+        fields["updated"] = updated.strftime(JIRA_DATETIME)
+        fields["status"] = {"name": "Fertig", "statusCategory": {"name": "Fertig"}}
+        yield {**issue, "fields": fields}
@@ -1,14 +1,463 @@
-import pickle
+import fcntl
+import json
 import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from data_transformation import (
+    CATEGORY_COLUMNS, ROLLUPS, TEXT_COLUMNS, apply_changes, changed_rows, merge_rollup, optimize_dtypes,
+    rollup_counts, split_text_columns,
+)
+from search_index import index_documents
+from snapshot import current_version, publish_snapshot, snapshot_file
+from metrics import timed
 
-DATA_PATH = "data/jira_data.pkl"
+# Parquet store, partitioned by firma and created month:
+#   data/store/tickets/<firma>/<YYYY-MM>.parquet   analytical ticket table
+#   data/store/text/<firma>/<YYYY-MM>.parquet      description/comments per key
+#   data/store/rollup/<name>.parquet               daily ticket counts, see ROLLUPS
+#   data/store/search_terms/<firma>/<YYYY-MM>.parquet  full-text postings (term, key, tf),
+#   data/store/search_docs/<firma>/<YYYY-MM>.parquet   document lengths, see search_index.py
+# `created` never changes for an issue, so an upsert only touches the partitions
+# of the fetched rows, and a load only reads the partitions of the requested window.
+# Writers (sync, backfill, the legacy migration) hold sync_lock, so they never
+# rewrite the same files at once.
+STORE_DIR = "data/store"
+TICKETS = "tickets"
+TEXT = "text"
+ROLLUP = "rollup"
+SEARCH_TERMS = "search_terms"
+SEARCH_DOCS = "search_docs"
+SYNC_LOCK_PATH = "data/sync.lock"
+# partitions of an upsert that has not published yet, see upsert_data
+PENDING_PATH = os.path.join(STORE_DIR, "pending.json")
 
-def save_data(df):
-    with open(DATA_PATH, "wb") as f:
-        pickle.dump(df, f)
+# single-file pickles written by older versions, see migrate_legacy_pickles()
+LEGACY_DATA_PATH = "data/jira_data.pkl"
+LEGACY_TEXT_PATH = "data/jira_text.pkl"
 
-def load_data():
-    if os.path.exists(DATA_PATH):
-        with open(DATA_PATH, "rb") as f:
-            return pickle.load(f)
-    return None
\ No newline at end of file
+
+@contextmanager
+def sync_lock(wait=True):
+    """
+    Hold the store's write lock for the block; yields False instead if `wait` is
+    off and another process or thread holds it. The lock is released if the
+    holder dies.
+    """
+    os.makedirs(os.path.dirname(SYNC_LOCK_PATH), exist_ok=True)
+    with open(SYNC_LOCK_PATH, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _partition_path(table, firma, month):
+    return os.path.join(STORE_DIR, table, firma, f"{month}.parquet")
+
+
+def _partitions(df):
+    """(firma, 'YYYY-MM') partition of every row."""
+    months = pd.Series(df['created'].to_numpy(dtype='datetime64[M]').astype(str), index=df.index)
+    return pd.Series(list(zip(df['firma'].astype(str), months.replace('NaT', 'none'))), index=df.index)
+
+
+def _partition_files(table, start=None, end=None, firmas=None, partitions=None):
+    """
+    Partition files of a table that can contain rows in [start, end] for the given
+    firmas, or exactly the given (firma, month) `partitions`.
+    """
+    root = os.path.join(STORE_DIR, table)
+    if not os.path.isdir(root):
+        return []
+    first = pd.Timestamp(start).strftime('%Y-%m') if start is not None else None
+    last = pd.Timestamp(end).strftime('%Y-%m') if end is not None else None
+    files = []
+    for firma in sorted(os.listdir(root)):
+        if firmas is not None and firma not in firmas:
+            continue
+        for name in sorted(os.listdir(os.path.join(root, firma))):
+            if not name.endswith('.parquet'):
+                continue
+            month = name[:-len('.parquet')]
+            if partitions is not None and (firma, month) not in partitions:
+                continue
+            if month != 'none' and ((first and month < first) or (last and month > last)):
+                continue
+            files.append(os.path.join(root, firma, name))
+    return files
+
+
+def _to_arrow(df):
+    # categoricals are always written as dictionary<int32, string>, whatever the
+    # number of categories, so that all partitions share one schema
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df = df.assign(**{col: df[col].astype('category')})
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and df[col].cat.categories.dtype != object:
+            df = df.assign(**{col: df[col].astype(object).astype('category')})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.dictionary(pa.int32(), pa.string())))
+    return table
+
+
+def _write_table(path, table):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write next to the target and swap it in, so readers never see half a file; the
+    # temporary name is unique, so two writers never write into the same file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pq.write_table(table, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _write_partition(path, df):
+    _write_table(path, _to_arrow(df))
+
+
+def _write_partitions(table, df, partitions=None):
+    """Write the rows of `df` per partition; with `partitions`, only those are written."""
+    keys = _partitions(df)
+    if partitions is not None:
+        df, keys = df[keys.isin(partitions)], keys[keys.isin(partitions)]
+    for (firma, month), part in df.groupby(keys, sort=False):
+        # rows sorted by created, so the row-group statistics prune date filters
+        part = part.sort_values('created', kind='stable', na_position='last', ignore_index=True)
+        _write_partition(_partition_path(table, firma, month), part)
+    return set(keys)
+
+
+def _read_table(table, start=None, end=None, firmas=None, columns=None, row_filter=None, partitions=None):
+    files = _partition_files(table, start, end, firmas, partitions)
+    if not files:
+        return None
+    created_type = pa.timestamp('ns', 'UTC')
+    if start is not None:
+        start_filter = ds.field('created') >= pa.scalar(pd.Timestamp(start).to_pydatetime(), created_type)
+        row_filter = start_filter if row_filter is None else row_filter & start_filter
+    if end is not None:
+        end_filter = ds.field('created') <= pa.scalar(pd.Timestamp(end).to_pydatetime(), created_type)
+        row_filter = end_filter if row_filter is None else row_filter & end_filter
+    # a partition where a column is entirely empty stores it as null type
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files], promote_options="permissive")
+    dataset = ds.dataset(files, schema=schema, format="parquet")
+    return dataset.to_table(columns=columns, filter=row_filter)
+
+
+def _read(table, start=None, end=None, firmas=None, columns=None, row_filter=None, partitions=None):
+    arrow_table = _read_table(table, start, end, firmas, columns, row_filter, partitions)
+    return None if arrow_table is None else arrow_table.to_pandas()
+
+
+@timed("store.save_data")
+def save_data(df, changed=None):
+    """
+    Write the ticket table to the partitioned store. With `changed` (the rows that
+    were upserted), only the partitions containing them are rewritten, see
+    upsert_data. Otherwise the whole store is replaced, with its rollups and search
+    index, and a new dashboard snapshot is published.
+    """
+    df, _ = split_text_columns(df)
+    if changed is not None:
+        _write_partitions(TICKETS, df, set(_partitions(changed)))
+    else:
+        written = _write_partitions(TICKETS, df)
+        for path in _partition_files(TICKETS):
+            firma, name = path.split(os.sep)[-2:]
+            if (firma, name[:-len('.parquet')]) not in written:
+                os.remove(path)
+        save_rollups(df)
+        for table in (SEARCH_TERMS, SEARCH_DOCS):
+            shutil.rmtree(os.path.join(STORE_DIR, table), ignore_errors=True)
+        build_search_index()
+        publish()
+
+
+def publish():
+    """
+    Publish the stored tickets and rollups as a new dashboard snapshot: the
+    generation that the charts, counts and ticket rows of a dashboard run read.
+    """
+    rollups = {f"{ROLLUP}-{name}": rollup_path(name) for name in ROLLUPS if os.path.exists(rollup_path(name))}
+    return publish_snapshot(_read_table(TICKETS), rollups)
+
+
+def rollup_path(name):
+    return os.path.join(STORE_DIR, ROLLUP, f"{name}.parquet")
+
+
+def save_rollups(df):
+    """Rebuild all rollups from the ticket table `df`."""
+    for name, dims in ROLLUPS.items():
+        _write_table(rollup_path(name), pa.Table.from_pandas(rollup_counts(df, dims), preserve_index=False))
+
+
+@timed("store.update_rollups")
+def update_rollups(df, partitions):
+    """
+    Replace the counts of the (firma, month) `partitions` in every rollup by those
+    of `df`, the written contents of these partitions. The counts are recomputed
+    from the store, not adjusted by a delta, so repeating an upsert that failed
+    half-way leaves correct rollups. Costs the size of the partitions and the
+    rollup, not of the ticket table. Rollups that are missing are built from the
+    whole store.
+    """
+    if not all(os.path.exists(rollup_path(name)) for name in ROLLUPS):
+        save_rollups(load_data())
+        return
+    for name, dims in ROLLUPS.items():
+        path = rollup_path(name)
+        rollup = pq.read_table(path).to_pandas()
+        # created_string is the UTC day, its month is the partition month
+        months = rollup['created_string'].astype(object).str[:7].fillna('none')
+        touched = pd.Series(list(zip(rollup['firma'].astype(str), months)), index=rollup.index).isin(partitions)
+        merged = merge_rollup(rollup[~touched], rollup_counts(df, dims), dims)
+        _write_table(path, pa.Table.from_pandas(merged, preserve_index=False))
+
+
+def rollup_file(name, version=None):
+    """
+    Path of a rollup as published with the snapshot `version`; the store's rollup
+    without a version or for a snapshot published without rollups. None if there is
+    none (empty store). Only reads: the writers keep the rollups.
+    """
+    if version is not None:
+        path = snapshot_file(f"{ROLLUP}-{name}", version)
+        if os.path.exists(path):
+            return path
+    path = rollup_path(name)
+    return path if os.path.exists(path) else None
+
+
+def snapshot_version():
+    """
+    Version of the current dashboard snapshot (see snapshot.py). A store without
+    one (e.g. a fresh checkout) is completed and published once, under the sync
+    lock; if a writer holds the lock, that writer publishes it. None if the store
+    is empty or not published yet.
+    """
+    version = current_version()
+    if version is None and _partition_files(TICKETS):
+        with sync_lock(wait=False) as acquired:
+            # checked again under the lock, another process may have published meanwhile
+            if acquired and current_version() is None:
+                if not all(os.path.exists(rollup_path(name)) for name in ROLLUPS):
+                    save_rollups(load_data())
+                build_search_index()
+                publish()
+        version = current_version()
+    return version
+
+
+def load_data(start=None, end=None, firmas=None, columns=None, partitions=None):
+    """
+    Load the ticket table, reading only the partitions and columns needed for the
+    created window [start, end] and the given firmas (everything if not given).
+    """
+    with timed("store.load_data") as m:
+        df = _read(TICKETS, start, end, firmas, columns, partitions=partitions)
+        if df is None:
+            return None
+        m["rows"] = len(df)
+        return optimize_dtypes(df)
+
+
+def _load_pending():
+    if not os.path.exists(PENDING_PATH):
+        return set()
+    with open(PENDING_PATH) as f:
+        return {tuple(partition) for partition in json.load(f)}
+
+
+def _save_pending(partitions):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    tmp_path = PENDING_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(sorted(partitions), f)
+    os.replace(tmp_path, PENDING_PATH)
+
+
+def upsert_data(df_new):
+    """
+    Upsert fetched tickets into the store. Only the partitions the fetched rows
+    fall into are read and rewritten. The new snapshot is published once the
+    tickets, their text, the rollups and the search index are all written. Returns
+    the rows that were written; fetched versions that are already stored are
+    skipped, and nothing is published if none is left. Run it under sync_lock.
+
+    The partitions being written are recorded in PENDING_PATH until the snapshot
+    is published. If an upsert fails half-way, the next one finishes them: their
+    rollups and search index are recomputed from the store, and the text of the
+    fetched versions that were stored is written again.
+    """
+    df_new, text_new = split_text_columns(df_new)
+    pending = _load_pending()
+    df_old = load_data(partitions=set(_partitions(df_new)) | pending)
+    with timed("store.changed_rows", rows=len(df_new)):
+        rows, replaced = changed_rows(df_old, df_new)
+    if len(rows) == 0 and not pending:
+        return rows
+    written = set(_partitions(rows))
+    _save_pending(pending | written)
+    df = apply_changes(df_old, rows, replaced)
+    if len(rows) > 0:
+        save_data(df, changed=rows)
+    # after the partitions are written, from their new contents
+    touched = written | pending
+    update_rollups(df[_partitions(df).isin(touched)], touched)
+    text_keys = set(rows['key'])
+    if pending:
+        # fetched versions in the unfinished partitions that equal the stored ones:
+        # a failed upsert may have stored them without their text
+        stored = df[_partitions(df).isin(pending)][['key', 'updated']]
+        text_keys |= set(df_new.merge(stored, on=['key', 'updated'])['key'])
+    text_new = text_new[text_new['key'].isin(text_keys)]
+    save_text(text_new)
+    docs = rows[['key', 'firma', 'created', 'summary']].merge(
+        text_new.drop_duplicates('key', keep='last')[['key', *TEXT_COLUMNS]], on='key', how='left')
+    update_search_index(docs[~_partitions(docs).isin(pending)])
+    for firma, month in sorted(pending):
+        with timed("store.index_partition", firma=firma, month=month):
+            _index_partition(firma, month)
+    # partitions of a store written before the index; a no-op once everything is indexed
+    build_search_index()
+    publish()
+    os.remove(PENDING_PATH)
+    return rows
+
+
+@timed("store.save_text")
+def save_text(df_text, key_col="key"):
+    """Upsert text rows (key, firma, created + text columns) into the side store."""
+    df_text = df_text.drop_duplicates(key_col, keep='last')
+    for (firma, month), part in df_text.groupby(_partitions(df_text), sort=False):
+        path = _partition_path(TEXT, firma, month)
+        if os.path.exists(path):
+            stored = pq.read_table(path).to_pandas()
+            part = pd.concat([stored[~stored[key_col].isin(part[key_col])], part], ignore_index=True)
+        _write_partition(path, part.reset_index(drop=True))
+
+
+def load_text(keys=None, key_col="key", start=None, end=None, firmas=None):
+    """Text columns for the given issue keys (all keys if None); the window narrows the partitions read."""
+    row_filter = ds.field(key_col).isin(list(keys)) if keys is not None else None
+    df = _read(TEXT, start, end, firmas, [key_col, *TEXT_COLUMNS], row_filter)
+    if df is None:
+        return pd.DataFrame(columns=[key_col, *TEXT_COLUMNS])
+    return df
+
+
+def _write_search_partition(firma, month, postings, docs):
+    # the document file goes last: it marks the partition as indexed
+    keys = docs['key']
+    for table, part, order in ((SEARCH_TERMS, postings, 'term'), (SEARCH_DOCS, docs, 'key')):
+        path = _partition_path(table, firma, month)
+        if os.path.exists(path):
+            stored = pq.read_table(path).to_pandas()
+            part = pd.concat([stored[~stored['key'].isin(keys)], part], ignore_index=True)
+        # postings sorted by term, so the row-group statistics prune term lookups
+        _write_partition(path, part.sort_values(order, ignore_index=True))
+
+
+@timed("store.update_search_index")
+def update_search_index(df):
+    """
+    Re-index the tickets in `df` (key, firma, created + search_index.SEARCH_COLUMNS)
+    in the index partitions they fall into. Partitions that are not indexed yet
+    are built in full from the store, so call this after the tickets and their
+    text are written.
+    """
+    partitions = _partitions(df)
+    indexed = {p for p in set(partitions) if os.path.exists(_partition_path(SEARCH_DOCS, *p))}
+    for firma, month in sorted(set(partitions) - indexed):
+        with timed("store.index_partition", firma=firma, month=month):
+            _index_partition(firma, month)
+    df = df[partitions.isin(indexed)]
+    if len(df) == 0:
+        return
+    postings, docs = index_documents(df)
+    for (firma, month), part in docs.groupby(_partitions(docs), sort=False):
+        _write_search_partition(firma, month, postings[postings['key'].isin(part['key'])], part)
+
+
+def _index_partition(firma, month):
+    partitions = {(firma, month)}
+    df = _read(TICKETS, columns=['key', 'firma', 'created', 'summary'], partitions=partitions)
+    text = _read(TEXT, columns=['key', *TEXT_COLUMNS], partitions=partitions)
+    if text is not None:
+        df = df.merge(text.drop_duplicates('key', keep='last'), on='key', how='left')
+    _write_search_partition(firma, month, *index_documents(df))
+
+
+def _indexable_partitions(start=None, end=None, firmas=None):
+    partitions = set()
+    for path in _partition_files(TICKETS, start, end, firmas):
+        firma, name = path.split(os.sep)[-2:]
+        partitions.add((firma, name[:-len('.parquet')]))
+    return partitions
+
+
+def build_search_index():
+    """
+    Index the ticket partitions that are not indexed yet (e.g. of a store written
+    before the search index). Part of the write path: run it under sync_lock.
+    """
+    for firma, month in sorted(_indexable_partitions()):
+        if not os.path.exists(_partition_path(SEARCH_DOCS, firma, month)):
+            with timed("store.index_partition", firma=firma, month=month):
+                _index_partition(firma, month)
+
+
+def search_index_files(start=None, end=None, firmas=None):
+    """
+    (posting files, document files) of the search index for the ticket partitions
+    of the created window [start, end]. Only reads: the writers keep the index up
+    to date (update_search_index, build_search_index).
+    """
+    partitions = _indexable_partitions(start, end, firmas)
+    return (_partition_files(SEARCH_TERMS, partitions=partitions),
+            _partition_files(SEARCH_DOCS, partitions=partitions))
+
+
+def migrate_legacy_pickles():
+    """
+    One-off conversion of the old single-file pickles into the Parquet store.
+    Only run this on pickles you created yourself: unpickling executes code.
+    """
+    import pickle
+
+    with open(LEGACY_DATA_PATH, "rb") as f:
+        df = optimize_dtypes(pickle.load(f))
+    df, df_text = split_text_columns(df)
+    if os.path.exists(LEGACY_TEXT_PATH):
+        with open(LEGACY_TEXT_PATH, "rb") as f:
+            legacy_text = pickle.load(f)
+        df_text = pd.concat([df_text, legacy_text], ignore_index=True).drop_duplicates('key', keep='last')
+        df_text = df_text.drop(columns=['firma', 'created']).merge(df[['key', 'firma', 'created']], on='key')
+    if 'comments' in df_text.columns:
+        # old extractor stored [] for tickets without comments
+        df_text = df_text.assign(comments=df_text['comments'].where(df_text['comments'].map(type) == str, ''))
+    with sync_lock():
+        # the text first: save_data builds the search index from the store
+        save_text(df_text)
+        save_data(df)
+    return len(df)
+
+
+if __name__ == "__main__":
+    print(f"Migrated {migrate_legacy_pickles()} tickets to {STORE_DIR}")
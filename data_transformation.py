@@ -1,250 +1,327 @@
 import pandas as pd
 import numpy as np
 import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+from itertools import islice
 
 # read json from data/jira-servicedesk-schema-objects.json
 # with open('data/jira-servicedesk-schema-objects.json', 'r') as f:
 #    schema = json.load(f)
 # object_id_to_name = {v['id']: v['name'] for v in schema['values']}
 
-# read object_id_to_name from json file
-with open('data/object_id_to_name.json', 'r') as f:#
-    object_id_to_name = json.load(f)
-
-def load_issues(issues):
-    df = {'key': [], 'summary': [], 'description': [], 'status': [], 'status_category': [], 'created': [], \
-        'updated': [], 'labels': [],'source':[],'priority':[],'category': [],'issuetype': [] , 'main_category_id': [],\
-        'sub_category_id': [], 'currentstatus_name': [], 'currentstatus_date': [], 'comments': [], 'request_type': [],\
-            'priority': [], 'clones': [], 'cloned_by': [], 'zentrale': [], 'filiale': [], 'Link': []}
-    for issue in issues:
-        df['key'].append(issue['key'])
-        df['summary'].append(issue['fields']['summary'])
-        df['description'].append(issue['fields']['description'])
-        df['status'].append(issue['fields']['status']['name'])
-        df['status_category'].append(issue['fields']['status']['statusCategory']['name'])
-        #df['creator'].append(issue['fields']['creator']['displayName'])
-        df['issuetype'].append(issue['fields']['issuetype']['name'])
-        df['created'].append(issue['fields']['created'])
-        df['updated'].append(issue['fields']['updated'])
-        df['labels'].append(issue['fields']['labels'])
-        df['priority'].append(issue['fields']['priority']['name'])
-        df['category'].append(issue['fields']['customfield_10065'])
-
-        if issue['fields']['customfield_10010'] is not None:
-            df['request_type'].append(issue['fields']['customfield_10010']['requestType']['name'])
+OBJECT_ID_TO_NAME_PATH = 'data/object_id_to_name.json'
+
+
+@cache
+def object_id_to_name():
+    """Category object id -> name, read from the json file on first use."""
+    with open(OBJECT_ID_TO_NAME_PATH, 'r') as f:
+        return json.load(f)
+
+_MISSING = object()
+
+
+def _join_comments(comments):
+    return '\n\n'.join([c['body'] for c in comments])
+
+
+def _object_ref(value):
+    return "ID_" + str(value)
+
+
+# Declarative field spec of the ticket table:
+# (column, path into the raw issue, default if the path is missing, post-processing)
+# Integer path steps index into lists, e.g. the first linked object of an asset field.
+ISSUE_FIELD_SPECS = [
+    ('key', ('key',), None, None),
+    ('summary', ('fields', 'summary'), None, None),
+    ('description', ('fields', 'description'), None, None),
+    ('status', ('fields', 'status', 'name'), None, None),
+    ('status_category', ('fields', 'status', 'statusCategory', 'name'), None, None),
+    ('created', ('fields', 'created'), None, None),
+    ('updated', ('fields', 'updated'), None, None),
+    ('labels', ('fields', 'labels'), None, None),
+    ('source', ('fields', 'customfield_10675', 'value'), '', None),
+    ('priority', ('fields', 'priority', 'name'), None, None),
+    ('category', ('fields', 'customfield_10065'), None, None),
+    ('issuetype', ('fields', 'issuetype', 'name'), None, None),
+    ('main_category_id', ('fields', 'customfield_10680', 0, 'objectId'), '', None),
+    ('sub_category_id', ('fields', 'customfield_10679', 0, 'objectId'), '', None),
+    ('currentstatus_name', ('fields', 'customfield_10010', 'currentStatus', 'status'), '', None),
+    ('currentstatus_date', ('fields', 'customfield_10010', 'currentStatus', 'statusDate', 'jira'), '', None),
+    ('comments', ('fields', 'comment', 'comments'), '', _join_comments),
+    ('request_type', ('fields', 'customfield_10010', 'requestType', 'name'), '', None),
+    ('clones', ('fields', 'issuelinks', 0, 'outwardIssue', 'key'), '', None),
+    ('cloned_by', ('fields', 'issuelinks', 0, 'inwardIssue', 'key'), '', None),
+    ('zentrale', ('fields', 'customfield_10673', 0, 'objectId'), '', _object_ref),
+    ('filiale', ('fields', 'customfield_10674', 0, 'objectId'), '', _object_ref),
+    ('Link', ('fields', 'customfield_10010', '_links', 'agent'), '', None),
+]
+
+# Jira fields read by load_issues. The loader requests only these instead of the
+# full payload.
+ISSUE_FIELDS = sorted({path[1] for _, path, _, _ in ISSUE_FIELD_SPECS if path[0] == 'fields'})
+
+# heavy free-text columns, kept in a side store keyed by `key` (see data_loading)
+TEXT_COLUMNS = ['description', 'comments']
+
+# columns of the ticket table built by load_issues, in order
+TICKET_COLUMNS = [
+    'firma', 'key', 'summary', 'description', 'status', 'status_category', 'created', 'updated', 'labels',
+    'source', 'priority', 'category', 'issuetype', 'main_category_id', 'sub_category_id', 'currentstatus_name',
+    'currentstatus_date', 'comments', 'request_type', 'clones', 'cloned_by', 'zentrale', 'filiale', 'Link',
+    'week_number', 'week_string', 'time_to_resolution_h', 'time_to_resolution_days', 'resolution', 'bdays',
+    'created_string', 'updated_string', 'year', 'month', 'Hauptkategorie', 'Unterkategorie',
+    'time_to_resolution_bin',
+]
+# raw Jira values that are lists or objects rather than scalars
+NON_SCALAR_COLUMNS = ['labels', 'category']
+
+# low-cardinality text columns (and the derived date strings) are stored as categoricals
+CATEGORY_COLUMNS = [
+    'firma', 'status', 'status_category', 'currentstatus_name', 'priority', 'issuetype', 'request_type',
+    'source', 'Hauptkategorie', 'Unterkategorie', 'zentrale', 'filiale', 'resolution',
+    'time_to_resolution_bin', 'created_string', 'updated_string', 'week_string',
+]
+# calendar fields and business days fit into small integers
+INTEGER_DTYPES = {'year': 'int16', 'month': 'int8', 'week_number': 'UInt8', 'bdays': 'int16'}
+
+RESOLUTION_BINS = [0,1,2,4,8,24,48,72,7*24,14*24,21*24]
+RESOLUTION_BIN_LABELS = [f"{left}–{right}" for left, right in zip(RESOLUTION_BINS[:-1], RESOLUTION_BINS[1:])]
+RESOLUTION_BIN_DTYPE = pd.CategoricalDtype(RESOLUTION_BIN_LABELS, ordered=True)
+
+# Ticket counts pre-aggregated per created day (with its week) and firma, see rollup_counts.
+# The dashboard charts are sums over these; zentrale has its own, smaller rollup
+# because it is the one high-cardinality dimension.
+ROLLUP_DAY = ['created_string', 'week_string', 'firma']
+ROLLUPS = {
+    'tickets': [*ROLLUP_DAY, 'status', 'status_category', 'currentstatus_name', 'Hauptkategorie',
+                'Unterkategorie', 'request_type', 'resolution', 'time_to_resolution_bin'],
+    'zentrale': [*ROLLUP_DAY, 'status_category', 'zentrale'],
+}
+
+
+def _step(values, step):
+    # one path step for a whole column; missing keys, short lists and None become _MISSING
+    try:
+        # fast path for steps that exist on every row
+        return [v[step] for v in values]
+    except (KeyError, IndexError, TypeError):
+        pass
+    if isinstance(step, int):
+        return [v[step] if type(v) is list and len(v) > step else _MISSING for v in values]
+    return [v.get(step, _MISSING) if type(v) is dict else _MISSING for v in values]
+
+
+def _date_strings(ts):
+    # 'YYYY-MM-DD' via numpy day precision; much faster than dt.strftime
+    days = ts.to_numpy(dtype='datetime64[D]').astype(str)
+    return pd.Series(days, index=ts.index).where(ts.notna())
+
+
+def extract_columns(issues, specs=ISSUE_FIELD_SPECS):
+    """
+    Build the raw ticket columns from a list of Jira issues, one column at a time.
+    Paths sharing a prefix (e.g. all customfield_10010 sub-fields) walk it only once.
+    """
+    walked = {(): list(issues)}
+
+    def values_at(path):
+        if path not in walked:
+            walked[path] = _step(values_at(path[:-1]), path[-1])
+        return walked[path]
+
+    columns = {}
+    for column, path, default, post in specs:
+        values = values_at(path)
+        if post is None:
+            columns[column] = [default if v is _MISSING else v for v in values]
         else:
-            df['request_type'].append('')
-        if issue['fields']['comment'] is not None:
-            df['comments'].append('\n\n'.join([c['body'] for c in issue['fields']['comment']['comments']]))
-        else:
-            df['comments'].append([])
-
-        try:
-            df['currentstatus_name'].append(issue['fields']['customfield_10010']['currentStatus']['status'])
-            df['currentstatus_date'].append(issue['fields']['customfield_10010']['currentStatus']['statusDate']['jira'])
-        except:
-            df['currentstatus_name'].append('')
-            df['currentstatus_date'].append('')
-
-        try:
-            v = issue['fields']['customfield_10675']['value']
-            df['source'].append(v)
-        except:
-            df['source'].append('')
-
-        cf = issue['fields']['customfield_10680']
-        if len(cf)>0:
-            df['main_category_id'].append(cf[0]['objectId'])
-        else:
-            df['main_category_id'].append('')
-        cf = issue['fields']['customfield_10679']
-        if len(cf)>0:
-            df['sub_category_id'].append(cf[0]['objectId'])
-        else:
-            df['sub_category_id'].append('')
-
-        try: 
-            df['clones'].append(issue['fields']['issuelinks'][0]['outwardIssue']['key'])    
-        except:
-            df['clones'].append('')
-        try:
-            df['cloned_by'].append(issue['fields']['issuelinks'][0]['inwardIssue']['key'])
-        except:
-            df['cloned_by'].append('')
-        
-        try:
-            df['zentrale'].append("ID_" + str(issue['fields']['customfield_10673'][0]['objectId']))
-        except:
-            df['zentrale'].append('')
-        try:
-            df['filiale'].append("ID_" + str(issue['fields']['customfield_10674'][0]['objectId']))
-        except:
-            df['filiale'].append('')
-        try:
-            df['Link'].append(issue['fields']['customfield_10010']['_links']['agent'])
-        except:
-            df['Link'].append('')
-
-    df = pd.DataFrame(df)
+            columns[column] = [default if v is _MISSING else post(v) for v in values]
+    return columns
+
+
+def optimize_dtypes(df):
+    """Convert the ticket table to its compact dtypes (categoricals and small integers)."""
+    dtypes = {col: 'category' for col in CATEGORY_COLUMNS
+              if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype)}
+    dtypes.update({col: dtype for col, dtype in INTEGER_DTYPES.items() if col in df.columns and df[col].dtype != dtype})
+    # the bins keep their fixed order, also after a round trip through storage
+    if 'time_to_resolution_bin' in df.columns and df['time_to_resolution_bin'].dtype != RESOLUTION_BIN_DTYPE:
+        dtypes['time_to_resolution_bin'] = RESOLUTION_BIN_DTYPE
+    return df.astype(dtypes) if dtypes else df
+
+
+def concat_tickets(frames):
+    """
+    pd.concat for ticket tables that keeps categorical columns categorical:
+    categories are unioned first instead of falling back to object columns.
+    """
+    frames = [frame for frame in frames if len(frame.columns)]
+    if not frames:
+        return pd.DataFrame()
+    for col in CATEGORY_COLUMNS:
+        columns = [frame[col] for frame in frames if col in frame.columns]
+        if len(columns) < 2 or not all(isinstance(c.dtype, pd.CategoricalDtype) for c in columns):
+            continue
+        if all(c.dtype == columns[0].dtype for c in columns):
+            continue
+        categories = sorted(set().union(*[c.cat.categories for c in columns]))
+        frames = [
+            frame.assign(**{col: frame[col].cat.set_categories(categories)}) if col in frame.columns else frame
+            for frame in frames
+        ]
+    return optimize_dtypes(pd.concat(frames, ignore_index=True))
+
+
+def split_text_columns(df, key_col="key"):
+    """
+    Split a ticket table into the analytical table and its text columns
+    (with the key, and firma/created to partition the text store like the tickets).
+    """
+    text_cols = [col for col in TEXT_COLUMNS if col in df.columns]
+    return df.drop(columns=text_cols), df[[key_col, 'firma', 'created', *text_cols]]
+
+
+def rollup_counts(df, dims):
+    """
+    Ticket count `n` per combination of `dims` (as plain strings; missing values
+    are kept as their own group).
+    """
+    if df is None or len(df) == 0:
+        return pd.DataFrame({**{dim: pd.Series(dtype=object) for dim in dims}, 'n': pd.Series(dtype='int64')})
+    keys = {dim: df[dim].astype(object) for dim in dims}
+    counts = pd.DataFrame(keys).groupby(dims, dropna=False, sort=False).size()
+    return counts.reset_index(name='n')
+
+
+def merge_rollup(rollup, delta, dims):
+    """Add the counts of `delta` to `rollup`; combinations that drop to zero are removed."""
+    frames = [frame for frame in (rollup, delta) if frame is not None and len(frame)]
+    if not frames:
+        return rollup_counts(None, dims)
+    merged = pd.concat(frames, ignore_index=True).astype({dim: object for dim in dims})
+    merged = merged.groupby(dims, dropna=False, sort=False)['n'].sum().reset_index()
+    return merged[merged['n'] != 0].sort_values(dims, na_position='first', ignore_index=True)
+
+
+def load_issues(issues, firma="IPRO"):
+    """Transform raw Jira issues of one project into the ticket table, labelled with `firma`."""
+    df = pd.DataFrame(extract_columns(issues))
     ### convert created, updated to datetime
     df['created'] = pd.to_datetime(df['created'], errors='coerce', utc=True)
     df['updated'] = pd.to_datetime(df['updated'], errors='coerce', utc=True)
     df['currentstatus_date'] = pd.to_datetime(df['currentstatus_date'], errors='coerce', utc=True)
 
-    df['week_number'] = df['created'].dt.isocalendar().week
-    df['week_string'] = df['created'].dt.strftime('%G-W%V')
+    iso = df['created'].dt.isocalendar()
+    df['week_number'] = iso.week
+    # same as strftime('%G-W%V')
+    df['week_string'] = (iso.year.astype(str) + '-W' + iso.week.astype(str).str.zfill(2)).where(df['created'].notna())
 
     df['time_to_resolution_h'] = (df['currentstatus_date'] - df['created']).dt.total_seconds() / 3600
     df['time_to_resolution_days'] = (df['currentstatus_date'] - df['created']).dt.days
-    df['resolution'] = '> 1 day'
     df['resolution'] = np.where(df['time_to_resolution_days']<=1, 'Same day', '> 1 day')
     df['bdays'] = np.busday_count(df['created'].to_numpy(dtype='datetime64[D]'),df['updated'].to_numpy(dtype='datetime64[D]'))
-    df['created_string'] = df['created'].dt.strftime('%Y-%m-%d')
-    df['updated_string'] = df['updated'].dt.strftime('%Y-%m-%d')
+    df['created_string'] = _date_strings(df['created'])
+    df['updated_string'] = _date_strings(df['updated'])
     df['year'] = df['created'].dt.year
     df['month'] = df['created'].dt.month
-    df['Hauptkategorie'] = df['main_category_id'].map(object_id_to_name)
-    df['Unterkategorie'] = df['sub_category_id'].map(object_id_to_name)
+    df['Hauptkategorie'] = df['main_category_id'].map(object_id_to_name())
+    df['Unterkategorie'] = df['sub_category_id'].map(object_id_to_name())
     # fill empty values with "NA"
     df['Unterkategorie'] = df['Unterkategorie'].fillna('NA')
-    # put time to resolution into bins
-    bins = [0,1,2,4,8,24,48,72,7*24,14*24,21*24]
-    df['time_to_resolution_bin'] = pd.cut(df['time_to_resolution_h'], bins=bins)
-    df['time_to_resolution_bin'] = df['time_to_resolution_bin'].apply(
-        lambda x: f"{int(x.left)}–{int(x.right)}"
-    )
+    # put time to resolution into bins, labelled "left–right"
+    df['time_to_resolution_bin'] = pd.cut(df['time_to_resolution_h'], bins=RESOLUTION_BINS, labels=RESOLUTION_BIN_LABELS)
     df['zentrale'] = df['zentrale'].astype(str)
     df['filiale'] = df['filiale'].astype(str)
-    df['firma'] = "IPRO"
+    df['firma'] = firma
     # move firma column to the front
     df = df[['firma', *[col for col in df.columns if col != 'firma']]]
 
-    return df
-
-
-def upsert_jira_data(df_old, df_new, key_col="key"):
-    df_old, df_new = df_old.align(df_new, join="outer", axis=1)
-
-    df_old = df_old.set_index(key_col)
-    df_new = df_new.set_index(key_col)
-
-    df_old.update(df_new)
-
-    new_rows = df_new.loc[df_new.index.difference(df_old.index)]
-    df_combined = pd.concat([df_old, new_rows])
-
-    return df_combined.reset_index()
-
-
-
-def load_issues_Amparex(issues):
-    df = {'key': [], 'summary': [], 'description': [], 'status': [], 'status_category': [], 'created': [], \
-        'updated': [], 'labels': [],'source':[],'priority':[],'category': [],'issuetype': [] , 'main_category_id': [],\
-        'sub_category_id': [], 'currentstatus_name': [], 'currentstatus_date': [], 'comments': [], 'request_type': [],\
-            'priority': [], 'clones': [], 'cloned_by': [], 'zentrale': [], 'filiale': [], 'Link': []}
-    for issue in issues:
-        df['key'].append(issue['key'])
-        df['summary'].append(issue['fields']['summary'])
-        df['description'].append(issue['fields']['description'])
-        df['status'].append(issue['fields']['status']['name'])
-        df['status_category'].append(issue['fields']['status']['statusCategory']['name'])
-        #df['creator'].append(issue['fields']['creator']['displayName'])
-        df['issuetype'].append(issue['fields']['issuetype']['name'])
-        df['created'].append(issue['fields']['created'])
-        df['updated'].append(issue['fields']['updated'])
-        df['labels'].append(issue['fields']['labels'])
-        df['priority'].append(issue['fields']['priority']['name'])
-        df['category'].append(issue['fields']['customfield_10065'])
-
-        if issue['fields']['customfield_10010'] is not None:
-            df['request_type'].append(issue['fields']['customfield_10010']['requestType']['name'])
-        else:
-            df['request_type'].append('')
-        if issue['fields']['comment'] is not None:
-            df['comments'].append('\n\n'.join([c['body'] for c in issue['fields']['comment']['comments']]))
+    return optimize_dtypes(df)
+
+
+def load_issues_parallel(issues, firma="IPRO", workers=None, chunk_size=2000):
+    """
+    load_issues over a process pool: raw issues (any iterable, e.g. an archive
+    replay) are cut into chunks, transformed in parallel and concatenated in
+    order. The result is identical to load_issues(list(issues), firma).
+    """
+    issues = iter(issues)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        while chunk := list(islice(issues, chunk_size)):
+            futures.append(pool.submit(load_issues, chunk, firma))
+        frames = [future.result() for future in futures]
+    return concat_tickets(frames) if frames else load_issues([], firma)
+
+
+def _same_rows(df_a, df_b):
+    """Row-wise equality of two equally long frames over their shared columns (missing equals missing)."""
+    same = np.ones(len(df_a), dtype=bool)
+    for col in df_a.columns.intersection(df_b.columns):
+        a, b = (df[col].values if df[col].dtype.kind == 'M' else df[col].to_numpy(dtype=object) for df in (df_a, df_b))
+        missing = pd.isna(a) & pd.isna(b)
+        if col in NON_SCALAR_COLUMNS:
+            # lists as fetched, numpy arrays as read from Parquet
+            as_tuple = lambda v: tuple(v) if isinstance(v, (list, np.ndarray)) else v
+            equal = np.fromiter((as_tuple(x) == as_tuple(y) for x, y in zip(a, b)), dtype=bool, count=len(a))
         else:
-            df['comments'].append([])
-
-        try:
-            df['currentstatus_name'].append(issue['fields']['customfield_10010']['currentStatus']['status'])
-            df['currentstatus_date'].append(issue['fields']['customfield_10010']['currentStatus']['statusDate']['jira'])
-        except:
-            df['currentstatus_name'].append('')
-            df['currentstatus_date'].append('')
-
-        try:
-            v = issue['fields']['customfield_10675']['value']
-            df['source'].append(v)
-        except:
-            df['source'].append('')
-
-        cf = issue['fields']['customfield_10680']
-        if len(cf)>0:
-            df['main_category_id'].append(cf[0]['objectId'])
-        else:
-            df['main_category_id'].append('')
-        cf = issue['fields']['customfield_10679']
-        if len(cf)>0:
-            df['sub_category_id'].append(cf[0]['objectId'])
-        else:
-            df['sub_category_id'].append('')
-
-        try: 
-            df['clones'].append(issue['fields']['issuelinks'][0]['outwardIssue']['key'])    
-        except:
-            df['clones'].append('')
-        try:
-            df['cloned_by'].append(issue['fields']['issuelinks'][0]['inwardIssue']['key'])
-        except:
-            df['cloned_by'].append('')
-        
-        try:
-            df['zentrale'].append("ID_" + str(issue['fields']['customfield_10673'][0]['objectId']))
-        except:
-            df['zentrale'].append('')
-        try:
-            df['filiale'].append("ID_" + str(issue['fields']['customfield_10674'][0]['objectId']))
-        except:
-            df['filiale'].append('')
-
-        try:
-            df['Link'].append(issue['fields']['customfield_10010']['_links']['agent'])
-        except:
-            df['Link'].append('')
-
-    df = pd.DataFrame(df)
-    ### convert created, updated to datetime
-    df['created'] = pd.to_datetime(df['created'], errors='coerce', utc=True)
-    df['updated'] = pd.to_datetime(df['updated'], errors='coerce', utc=True)
-    df['currentstatus_date'] = pd.to_datetime(df['currentstatus_date'], errors='coerce', utc=True)
-
-    df['week_number'] = df['created'].dt.isocalendar().week
-    df['week_string'] = df['created'].dt.strftime('%G-W%V')
-
-    df['time_to_resolution_h'] = (df['currentstatus_date'] - df['created']).dt.total_seconds() / 3600
-    df['time_to_resolution_days'] = (df['currentstatus_date'] - df['created']).dt.days
-    df['resolution'] = '> 1 day'
-    df['resolution'] = np.where(df['time_to_resolution_days']<=1, 'Same day', '> 1 day')
-    df['bdays'] = np.busday_count(df['created'].to_numpy(dtype='datetime64[D]'),df['updated'].to_numpy(dtype='datetime64[D]'))
-    df['created_string'] = df['created'].dt.strftime('%Y-%m-%d')
-    df['updated_string'] = df['updated'].dt.strftime('%Y-%m-%d')
-    df['year'] = df['created'].dt.year
-    df['month'] = df['created'].dt.month
-    df['Hauptkategorie'] = df['main_category_id'].map(object_id_to_name)
-    df['Unterkategorie'] = df['sub_category_id'].map(object_id_to_name)
-    # fill empty values with "NA"
-    df['Unterkategorie'] = df['Unterkategorie'].fillna('NA')
-    # put time to resolution into bins
-    bins = [0,1,2,4,8,24,48,72,7*24,14*24,21*24]
-    df['time_to_resolution_bin'] = pd.cut(df['time_to_resolution_h'], bins=bins)
-    df['time_to_resolution_bin'] = df['time_to_resolution_bin'].apply(
-        lambda x: f"{int(x.left)}–{int(x.right)}"
-    )
-    df['zentrale'] = df['zentrale'].astype(str)
-    df['filiale'] = df['filiale'].astype(str)
-    df['firma'] = "Amparex"
-    # move firma column to the front
-    df = df[['firma', *[col for col in df.columns if col != 'firma']]]
-
-    return df
-
+            equal = a == b
+        same &= equal | missing
+    return same
+
+
+def changed_rows(df_old, df_new, key_col="key", updated_col="updated"):
+    """
+    Rows of df_new that have to be written into df_old: keys that are not stored
+    yet, stored keys whose fetched version is newer (by `updated`) than the stored
+    one, and equally recent versions whose fields differ. Versions that are already
+    stored (e.g. the overlap an incremental sync fetches again) and older ones are
+    skipped. Returns the rows and the positions in df_old of the rows they replace.
+    """
+    # one version per key in the fetch, the most recent one
+    df_new = df_new.sort_values(updated_col, kind='stable').drop_duplicates(key_col, keep='last')
+    if df_old is None or len(df_old) == 0:
+        return df_new, np.array([], dtype=np.intp)
+
+    # hash lookup of the fetched keys in the stored table
+    positions = pd.Index(df_old[key_col]).get_indexer(df_new[key_col])
+    stored = positions >= 0
+    old_updated = df_old[updated_col].values[positions[stored]]
+    new_updated = df_new[updated_col].values[stored]
+    write = np.ones(len(df_new), dtype=bool)
+    # comparisons with NaT are False, so rows without a timestamp are written
+    newer = ~(new_updated <= old_updated)
+    equal = new_updated == old_updated
+    # only the few equally recent rows are compared field by field
+    equal[equal] = ~_same_rows(df_new[stored][equal], df_old.iloc[positions[stored][equal]])
+    write[stored] = newer | equal
+
+    return df_new[write], positions[stored & write]
+
+
+def apply_changes(df_old, rows, replaced):
+    """
+    Replace the rows at positions `replaced` of df_old by `rows` (whole rows, so
+    fields cleared in Jira are cleared here too) and append the remaining new rows.
+    """
+    if df_old is None or len(df_old) == 0:
+        return concat_tickets([rows])
+    if len(rows) == 0:
+        return df_old
+    keep = np.ones(len(df_old), dtype=bool)
+    keep[replaced] = False
+    return concat_tickets([df_old[keep], rows])
+
+
+def upsert_jira_data(df_old, df_new, key_col="key", updated_col="updated"):
+    """
+    Upsert fetched tickets into the stored table by `key`. A fetched row only
+    wins if it is newer than the stored one, or as recent but different; the work
+    done depends on the number of changed rows, and an empty delta returns df_old
+    unchanged.
+    """
+    rows, replaced = changed_rows(df_old, df_new, key_col, updated_col)
+    return apply_changes(df_old, rows, replaced)
@@ -1,8 +1,16 @@
 import pandas as pd
-from jira import JIRA
 from dotenv import load_dotenv
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+import pytz
 import os
 import json
+import queue
+import threading
+from data_transformation import ISSUE_FIELDS, concat_tickets, load_issues
+from raw_archive import append_page, new_run_id
+from metrics import record, timed
 
 load_dotenv(override=True)
 
@@ -10,56 +18,274 @@ load_dotenv(override=True)
 JIRA_URL = os.getenv("JIRA_URL")
 JIRA_USERNAME = os.getenv("JIRA_USERNAME")
 JIRA_PASSWORD = os.getenv("JIRA_PASSWORD")
+# JQL date literals are interpreted in the timezone of the Jira user profile
+JIRA_TIMEZONE = pytz.timezone(os.getenv("JIRA_TIMEZONE", "Europe/Berlin"))
 
-jira = JIRA(
-    server=JIRA_URL,
-    basic_auth=(JIRA_USERNAME, JIRA_PASSWORD)
-)
-
-
-def fetch_jira_issues(start_dt, end_dt, max_issues=1000, project="SDIPR"):
-        
-    jira = JIRA(
-        server=JIRA_URL,
-        basic_auth=(JIRA_USERNAME, JIRA_PASSWORD)
-    )
-    start_str = start_dt.strftime("%Y-%m-%d %H:%M")
-    end_str   = end_dt.strftime("%Y-%m-%d %H:%M")
-    all_issues = []
-    jql = f"project = {project} AND created >= '{start_str}' AND created <= '{end_str}' ORDER BY created DESC"
+# Jira project key -> firma label used in the stored ticket table
+PROJECTS = {"SDIPR": "IPRO", "SDAX": "Amparex"}
+
+SYNC_STATE_PATH = "data/sync_state.json"
+# JQL only has minute precision, so re-read a small overlap behind the watermark.
+# Re-fetched issues are harmless because they are upserted by key.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# parallel fetch: number of worker threads / HTTP connections and time shards per project
+FETCH_WORKERS = int(os.getenv("JIRA_FETCH_WORKERS", "8"))
+FETCH_SHARDS = int(os.getenv("JIRA_FETCH_SHARDS", "4"))
+# debugging aid: request every field, rendered field, transition and changelog
+# instead of only the fields the transformation reads
+FULL_PAYLOAD = os.getenv("JIRA_FULL_PAYLOAD", "").lower() in ("1", "true", "yes")
+
+# one shared client for the whole process, created on first use: constructing it
+# contacts the server, which must not happen on import (app start, offline runs)
+_jira = None
+_jira_lock = threading.Lock()
+
+
+def _record_response(response, *args, **kwargs):
+    # latency (until the headers arrived) and payload size of every Jira request
+    record("jira.http", response.elapsed.total_seconds(), bytes=len(response.content), status=response.status_code)
+
+
+def get_jira_client():
+    """The shared Jira client; its session keeps a connection pool large enough for all fetch workers."""
+    global _jira
+    with _jira_lock:
+        if _jira is None:
+            from jira import JIRA
+
+            client = JIRA(server=JIRA_URL, basic_auth=(JIRA_USERNAME, JIRA_PASSWORD))
+            client._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_WORKERS))
+            client._session.hooks["response"].append(_record_response)
+            _jira = client
+        return _jira
+
+
+def _jql_datetime(dt):
+    return dt.astimezone(JIRA_TIMEZONE).strftime("%Y-%m-%d %H:%M")
+
+
+def _search_pages(jql, max_issues, full_payload=False, project=None, run_id=None):
+    """
+    Walk the result pages of a JQL search with the shared client and yield
+    (issues, truncated) per page; `truncated` marks a last page cut off at `max_issues`.
+    With a `run_id`, every page is appended to the raw archive of `project`.
+    """
     next_token = None
     counter = 0
     b_max_results = 100
     while True:
 
-        page = jira.enhanced_search_issues(
-            jql_str=jql,
-            maxResults=b_max_results,         # per API call
-            nextPageToken=next_token,
-            json_result=True,
-            expand="*all,customfield_10673,customfield_10674",
-        )
-        all_issues.extend(page.get("issues", []))
+        if full_payload:
+            projection = dict(fields="*all", expand="*all,customfield_10673,customfield_10674")
+        else:
+            # copy: the client rewrites the list in place when translating field names
+            projection = dict(fields=list(ISSUE_FIELDS))
+        with timed("jira.page", project=project) as m:
+            page = get_jira_client().enhanced_search_issues(
+                jql_str=jql,
+                maxResults=b_max_results,         # per API call
+                nextPageToken=next_token,
+                json_result=True,
+                **projection,
+            )
+            issues = page.get("issues", [])
+            m["rows"] = len(issues)
+        if run_id is not None:
+            append_page(project, run_id, issues)
 
         next_token = page.get("nextPageToken")
-
-        if not next_token:  # no more pages
-            break
         counter += b_max_results
-        if counter >= max_issues:
-            break
+        truncated = bool(next_token) and counter >= max_issues
+        yield issues, truncated
+
+        if not next_token or truncated:  # no more pages
+            return
+
+
+def shard_window(start_dt, end_dt, shards):
+    """
+    Split [start_dt, end_dt] into up to `shards` disjoint, minute-aligned windows
+    (JQL has minute precision). Returns (start, end, end_inclusive) tuples.
+    """
+    start = pd.Timestamp(start_dt).floor("min")
+    end = pd.Timestamp(end_dt).floor("min")
+    bounds = pd.date_range(start, end, periods=max(shards, 1) + 1).floor("min").unique()
+    if len(bounds) < 2:
+        return [(start, end, True)]
+    return [(bounds[i], bounds[i + 1], i == len(bounds) - 2) for i in range(len(bounds) - 1)]
+
+
+def _window_jql(project, field, start, end, end_inclusive):
+    # created windows are listed newest first (as before), updated windows oldest
+    # first so that a truncated incremental fetch still gives a valid watermark
+    order = "DESC" if field == "created" else "ASC"
+    end_op = "<=" if end_inclusive else "<"
+    return (f"project = {project} AND {field} >= '{_jql_datetime(start)}' "
+            f"AND {field} {end_op} '{_jql_datetime(end)}' ORDER BY {field} {order}")
+
+
+_DONE = object()
+
+
+def iter_issue_pages(windows, field="created", max_issues=1000, shards=FETCH_SHARDS, full_payload=FULL_PAYLOAD, run_id=None):
+    """
+    Fetch several projects at once and yield (project, shard, issues, truncated) for
+    every result page as soon as any shard receives it. `windows` maps
+    project -> (start_dt, end_dt) on `field` ("created" or "updated"); every window is
+    split into `shards` disjoint time shards and all shards run concurrently on the
+    shared client. Raw pages are archived under `run_id` (a new run by default).
+    Only a few pages are buffered, so fetching overlaps with whatever the caller
+    does with each page.
+    """
+    run_id = run_id or new_run_id()
+    jobs = [
+        (project, shard)
+        for project, (start_dt, end_dt) in windows.items()
+        for shard in shard_window(start_dt, end_dt, shards)
+    ]
+    pages = queue.Queue(maxsize=2 * FETCH_WORKERS)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(shard_index, project, window):
+        try:
+            jql = _window_jql(project, field, *window)
+            for issues, truncated in _search_pages(jql, max_issues, full_payload, project, run_id):
+                if not put((project, shard_index, issues, truncated)):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    try:
+        for shard_index, (project, window) in enumerate(jobs):
+            pool.submit(run, shard_index, project, window)
+        remaining = len(jobs)
+        while remaining:
+            item = pages.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        # also reached when the consumer stops early: let the workers wind down
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def fetch_tickets(windows, field="created", max_issues=1000, shards=FETCH_SHARDS, full_payload=FULL_PAYLOAD, run_id=None, transform_pool=None, on_page=None):
+    """
+    Fetch and transform in one pass: every page is turned into a ticket frame as
+    soon as it arrives, so only a few pages of raw JSON are held at any time.
+    With a `transform_pool` (e.g. a ProcessPoolExecutor) the pages are transformed
+    on the pool instead of in this thread.
+    `on_page(project, n_issues)` is called after every page; an exception raised by
+    it stops the fetch (the fetch workers wind down after their current page).
+    Issues seen by several shards are merged deterministically (the latest version
+    wins; an updated window is cut where a truncated shard leaves a gap). Returns
+    one ticket table for all projects in `windows`.
+    """
+    frames = []
+    cutoffs = {}
+    for project, shard, issues, truncated in iter_issue_pages(windows, field, max_issues, shards, full_payload, run_id):
+        if not issues:
+            continue
+        if transform_pool is None:
+            with timed("transform.load_issues", project=project, rows=len(issues)):
+                frames.append(load_issues(issues, firma=PROJECTS[project]))
+        else:
+            frames.append(transform_pool.submit(load_issues, issues, PROJECTS[project]))
+        if on_page is not None:
+            on_page(project, len(issues))
+        if truncated:
+            last = pd.Timestamp(issues[-1]['fields'][field])
+            cutoffs[project] = min(cutoffs.get(project, last), last)
+    if not frames:
+        return pd.DataFrame()
+    df = concat_tickets([frame.result() if isinstance(frame, Future) else frame for frame in frames])
+
+    # keep the latest version of issues seen by more than one shard
+    df = df.sort_values(['updated', 'key']).drop_duplicates('key', keep='last')
+    merged = []
+    for project in windows:
+        project_df = df[df['firma'] == PROJECTS[project]]
+        if field == "created":
+            project_df = project_df.sort_values(['created', 'key'], ascending=False)
+        else:
+            project_df = project_df.sort_values([field, 'key'])
+            if project in cutoffs:
+                project_df = project_df[project_df[field] <= cutoffs[project]]
+        merged.append(project_df.head(max_issues))
+        print(f"Total issues fetched for {project}:", len(merged[-1]))
+    return concat_tickets(merged)
+
+
+def _updated_windows(watermarks):
+    now = datetime.now(timezone.utc)
+    return {project: (since_dt - WATERMARK_OVERLAP, now) for project, since_dt in watermarks.items()}
+
+
+def fetch_updated_tickets(watermarks, max_issues=1000, shards=FETCH_SHARDS, full_payload=FULL_PAYLOAD, on_page=None):
+    """Incremental sync of several projects at once, transformed page by page into one ticket table."""
+    return fetch_tickets(_updated_windows(watermarks), "updated", max_issues, shards, full_payload, on_page=on_page)
+
+
+def load_watermarks():
+    if not os.path.exists(SYNC_STATE_PATH):
+        return {}
+    with open(SYNC_STATE_PATH, "r") as f:
+        state = json.load(f)
+    return {project: pd.Timestamp(ts) for project, ts in state.get("watermarks", {}).items()}
+
+
+def save_watermarks(watermarks):
+    state = {"watermarks": {project: ts.isoformat() for project, ts in watermarks.items()}}
+    tmp_path = SYNC_STATE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, SYNC_STATE_PATH)
+
+
+def get_watermark(project, df=None, default=None):
+    """
+    High-water mark (max `updated`) for a project: the stored sync state if present,
+    otherwise derived from the already loaded ticket table, otherwise `default`.
+    """
+    watermarks = load_watermarks()
+    if project in watermarks:
+        return watermarks[project]
+    if df is not None and len(df) > 0 and 'updated' in df.columns:
+        updated = df.loc[df['firma'] == PROJECTS[project], 'updated']
+        if updated.notna().any():
+            return updated.max()
+    return default
 
-    print("Total issues fetched:", len(all_issues))
-    # save all_issues to json file
-    with open('data/jira_issues.json', 'w') as f:
-        json.dump(all_issues, f, indent=4)
-    #dates = [issue["created"] for issue in all_issues]
-    #dates = [datetime.strptime(date, "%Y-%m-%dT%H:%M:%S.%f%z") for date in dates]
-    #dates = [date.date() for date in dates]
-    #dates = [date.strftime("%Y-%m-%d") for date in dates]
-    
 
-    return all_issues
+def advance_watermarks(df_new):
+    """Move the stored watermarks forward to the latest `updated` per project in a fetched table."""
+    watermarks = load_watermarks()
+    if len(df_new) == 0:
+        return watermarks
+    latest = df_new.groupby('firma', observed=True)['updated'].max()
+    for project, firma in PROJECTS.items():
+        if firma in latest.index and pd.notna(latest[firma]):
+            if project not in watermarks or latest[firma] > watermarks[project]:
+                watermarks[project] = latest[firma]
+    save_watermarks(watermarks)
+    return watermarks
 
 
 
@@ -88,4 +314,4 @@ def parse_clone_links(issue):
         except:
             pass
 
-    return result
\ No newline at end of file
+    return result
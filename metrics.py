@@ -0,0 +1,163 @@
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# Lightweight per-stage timings for the fetch, transform, store and dashboard code.
+# Every finished stage is one record: stage name, seconds, RSS delta and optional
+# counters (rows, bytes) plus labels (project, view, ...). Records are kept in a
+# bounded in-process buffer for the admin panel; count, seconds and counters are
+# also summed up per stage and label set since the start of the process (the
+# Prometheus export, whose counters must never go back). Exports:
+#   METRICS_LOG=<path>        append every record as one JSON line
+#   METRICS_PROM_FILE=<path>  Prometheus text summary, rewritten by write_prometheus
+#                             (e.g. for the node_exporter textfile collector)
+METRICS_BUFFER = int(os.getenv("METRICS_BUFFER", "5000"))
+METRICS_LOG = os.getenv("METRICS_LOG")
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE")
+COUNTERS = ("rows", "bytes")
+# fields exported as Prometheus labels; the others (month, ...) would only multiply series
+LABELS = ("project", "firma", "status", "incremental")
+
+_records = deque(maxlen=METRICS_BUFFER)
+_log_lock = threading.Lock()
+# (stage, labels) -> cumulative count, seconds and counters
+_totals = {}
+_totals_lock = threading.Lock()
+
+
+def rss_bytes():
+    # current resident set size; peak RSS where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _series(stage, fields):
+    return stage, tuple((label, str(fields[label])) for label in LABELS if fields.get(label) is not None)
+
+
+def record(stage, seconds, **fields):
+    """Record a finished stage."""
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "stage": stage,
+        "seconds": seconds,
+        **fields,
+    }
+    _records.append(entry)
+    with _totals_lock:
+        totals = _totals.setdefault(_series(stage, fields), dict.fromkeys(("count", "seconds", *COUNTERS), 0))
+        totals["count"] += 1
+        totals["seconds"] += seconds
+        for col in COUNTERS:
+            totals[col] += fields.get(col) or 0
+    if METRICS_LOG:
+        with _log_lock:
+            with open(METRICS_LOG, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+    return entry
+
+
+@contextmanager
+def timed(stage, **fields):
+    """
+    Time a block (or, as a decorator, a function) as `stage`. The yielded dict
+    takes counters found inside the block, e.g. `m["rows"] = len(df)`.
+    The memory delta is process-wide, so concurrent stages show up in each other.
+    """
+    rss = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(stage, time.perf_counter() - start, rss_delta=rss_bytes() - rss, **fields)
+
+
+def records(stage=None):
+    """Buffered records, oldest first, optionally only those of stages starting with `stage`."""
+    return [r for r in list(_records) if stage is None or r["stage"].startswith(stage)]
+
+
+def summary():
+    """Per-stage count, total/mean/p95/max seconds and counter sums of the buffered records."""
+    df = pd.DataFrame(records())
+    if df.empty:
+        return pd.DataFrame(columns=["stage", "count", "total_s", "mean_s", "p95_s", "max_s", *COUNTERS])
+    for col in COUNTERS:
+        if col not in df.columns:
+            df[col] = 0
+    grouped = df.groupby("stage")
+    result = pd.DataFrame({
+        "count": grouped.size(),
+        "total_s": grouped["seconds"].sum(),
+        "mean_s": grouped["seconds"].mean(),
+        "p95_s": grouped["seconds"].quantile(0.95),
+        "max_s": grouped["seconds"].max(),
+        **{col: grouped[col].sum() for col in COUNTERS},
+    })
+    return result.sort_values("total_s", ascending=False).reset_index()
+
+
+def to_jsonl():
+    return "".join(json.dumps(r, default=str) + "\n" for r in records())
+
+
+def _label_text(stage, labels, **extra):
+    def escape(value):
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    pairs = [("stage", stage), *labels, *extra.items()]
+    return ",".join(f'{name}="{escape(value)}"' for name, value in pairs)
+
+
+def prometheus_text():
+    """
+    Per stage and label set: cumulative count, seconds and counters since the
+    process started, and the p95 of the buffered records, in the Prometheus text
+    exposition format.
+    """
+    with _totals_lock:
+        totals = {series: dict(values) for series, values in sorted(_totals.items())}
+    recent = {}
+    for r in records():
+        recent.setdefault(_series(r["stage"], r), []).append(r["seconds"])
+
+    lines = [
+        "# HELP jira_ui_stage_seconds Time spent per stage.",
+        "# TYPE jira_ui_stage_seconds summary",
+    ]
+    for (stage, labels), values in totals.items():
+        label = _label_text(stage, labels)
+        if (stage, labels) in recent:
+            p95 = pd.Series(recent[(stage, labels)]).quantile(0.95)
+            lines.append(f"jira_ui_stage_seconds{{{_label_text(stage, labels, quantile='0.95')}}} {p95:.6f}")
+        lines.append(f"jira_ui_stage_seconds_count{{{label}}} {values['count']}")
+        lines.append(f"jira_ui_stage_seconds_sum{{{label}}} {values['seconds']:.6f}")
+    for col in COUNTERS:
+        lines.append(f"# HELP jira_ui_stage_{col}_total {col.capitalize()} processed per stage.")
+        lines.append(f"# TYPE jira_ui_stage_{col}_total counter")
+        for (stage, labels), values in totals.items():
+            lines.append(f"jira_ui_stage_{col}_total{{{_label_text(stage, labels)}}} {int(values[col])}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=METRICS_PROM_FILE):
+    """Rewrite the Prometheus text file atomically (no-op without a path)."""
+    if not path:
+        return
+    # every script run rewrites the file, concurrent runs need their own temporary file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(prometheus_text())
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
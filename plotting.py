@@ -1,5 +1,9 @@
 import streamlit as st
 import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import queries
+from metrics import timed
 
 
 def apply_font(fig, base=20):
@@ -45,4 +49,319 @@ def apply_filters(df):
     if assignee:
         df = df[df.assignee.isin(assignee)]
 
-    return df
\ No newline at end of file
+    return df
+
+# -------------------------------
+# Cached aggregations and figures
+# -------------------------------
+# Results are cached per (dataset version, filters, view mode). `version` is the
+# published snapshot version: every upsert publishes a new one, so the entries of
+# the old data are never hit again and age out of the bounded (LRU) caches.
+# Figure functions return None when the window has nothing to plot, so the view
+# can show a note instead of an empty chart.
+CACHE_ENTRIES = 128
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def aggregate(query, version, *args, **kwargs):
+    """Cached result of queries.<query>(*args, **kwargs), read from snapshot `version`."""
+    with timed(f"query.{query}") as m:
+        result = getattr(queries, query)(*args, version=version, **kwargs)
+        m["rows"] = len(result) if hasattr(result, '__len__') else 1
+        return result
+
+
+def _empty(result):
+    return result is None or len(result) == 0
+
+
+def _percent_labels(counts, shares, sep=' '):
+    # vectorized f"{count}{sep}({share:.0%})"
+    percent = (shares * 100).round().astype('int64').astype(str)
+    return counts.astype(str) + sep + '(' + percent + '%)'
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+@timed("figure.overview")
+def overview_figure(version, start, end, firmas, x_axis, x_axis_label, mode, search=None):
+    # 1. Prepare the Data
+    result = aggregate('status_counts', version, start, end, firmas, x_axis, search=search)
+    if _empty(result):
+        return None
+
+    # Calculate percentages
+    total_per_group = result.groupby(x_axis)['key'].transform('sum')
+    result['percentage'] = result['key'] / total_per_group
+
+    # Create custom label
+    result['custom_label'] = _percent_labels(result['key'], result['percentage'])
+
+    # Get all unique statuses
+    status_order = result['status'].unique().tolist()
+
+    # If "Fertig" exists, move it to the front of the list (Index 0 = Bottom of stack)
+    target_status = "Fertig"
+    if target_status in status_order:
+        status_order.remove(target_status)
+        status_order.insert(0, target_status)
+
+    # 2. Configure Axis Variables
+    if mode == "Absolute Zahlen":
+        y_col = 'key'
+        y_title = 'Anzahl Tickets'
+        y_format = None
+    else:
+        y_col = 'percentage'
+        y_title = 'Prozentualer Anteil'
+        y_format = '.0%'
+
+    # 3. Plot with Category Order
+    fig = px.bar(
+        result,
+        x=x_axis,
+        y=y_col,
+        text='custom_label',
+        color='status',
+        # Apply the forced order here
+        category_orders={'status': status_order}
+    )
+
+    fig.update_xaxes(title_text=x_axis_label)
+    fig.update_yaxes(title_text=y_title, tickformat=y_format)
+    fig = apply_font(fig)
+    return fig
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+@timed("figure.categories")
+def categories_figure(version, start, end, firmas, mode, search=None):
+    # 1. Prepare Data
+    result = aggregate('category_resolution_counts', version, start, end, firmas, search=search)
+    if _empty(result):
+        return None
+
+    # Calculate Totals & Percentages
+    total_per_group = result.groupby('Hauptkategorie')['Anzahl'].transform('sum')
+    result['percentage'] = result['Anzahl'] / total_per_group
+
+    result['custom_label'] = _percent_labels(result['Anzahl'], result['percentage'], sep='<br>')
+
+    # 2. Define Sorting
+    category_totals = result.groupby('Hauptkategorie')['Anzahl'].sum().reset_index()
+    category_totals = category_totals.sort_values('Anzahl', ascending=False)
+    sorted_categories = category_totals['Hauptkategorie'].tolist()
+
+    resolution_order = result['resolution'].unique().tolist()
+    if "Same day" in resolution_order:
+        resolution_order.remove("Same day")
+        resolution_order.insert(0, "Same day")
+
+    # 3. Configure Axis
+    if mode == "Absolute Zahlen":
+        y_col = 'Anzahl'
+        y_title = 'Anzahl Tickets'
+        y_format = None
+        y_text_pos = category_totals['Anzahl']
+        text_content = category_totals['Anzahl'].astype(str)
+        y_max = category_totals['Anzahl'].max() * 1.15
+    else:
+        y_col = 'percentage'
+        y_title = 'Prozentualer Anteil'
+        y_format = '.0%'
+        y_text_pos = [1] * len(category_totals)
+        text_content = "Total: " + category_totals['Anzahl'].astype(str)
+        y_max = 1.15
+
+    # 4. Plot Main Bars
+    fig = px.bar(
+        result,
+        x='Hauptkategorie',
+        y=y_col,
+        color='resolution',
+        text='custom_label',
+        color_discrete_map={"Same day": "green", "> 1 day": "#FFD700"},
+        category_orders={'resolution': resolution_order, 'Hauptkategorie': sorted_categories}
+    )
+
+    # Apply styling to the bars before adding the scatter trace, so that
+    # apply_font does not try to set bar properties on the scatter trace
+    fig.update_traces(textposition='auto')
+    fig = apply_font(fig)
+
+    # 5. Add the Scatter Trace (Totals) after styling
+    fig.add_trace(
+        go.Scatter(
+            x=category_totals['Hauptkategorie'],
+            y=y_text_pos,
+            text=text_content,
+            mode='text',
+            textposition='top center',
+            textfont=dict(size=14, color='black', weight='bold'),
+            showlegend=False,
+            hoverinfo='skip'
+        )
+    )
+
+    # Final Layout Updates
+    fig.update_yaxes(title_text=y_title, tickformat=y_format, range=[0, y_max])
+    return fig
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+@timed("figure.subcategories")
+def subcategories_figure(version, start, end, firmas, search=None):
+    # sorted by overall count
+    result = aggregate('subcategory_counts', version, start, end, firmas, search=search)
+    if _empty(result):
+        return None
+    fig = px.bar(result, x='Hauptkategorie', y='Anzahl', color='Unterkategorie')
+    fig = apply_font(fig)
+    return fig
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+@timed("figure.sources")
+def sources_figure(version, start, end, firmas, x_axis, x_axis_label, mode, search=None):
+    # 1. Prepare Data
+    # Empty request types are filtered out
+    result = aggregate('request_type_counts', version, start, end, firmas, x_axis, search=search)
+    if _empty(result):
+        return None
+
+    # Calculate Totals & Percentages per x-axis group
+    # We group by x_axis to get the total stack height for each column
+    total_per_group = result.groupby(x_axis)['key'].transform('sum')
+    result['percentage'] = result['key'] / total_per_group
+
+    # Create Custom Label: "Count(Percentage%)"
+    result['custom_label'] = _percent_labels(result['key'], result['percentage'], sep='')
+
+    # 2. Calculate Totals for Top Labels
+    # Create a separate DataFrame for the totals that will sit on top of the bars
+    group_totals = result.groupby(x_axis)['key'].sum().reset_index()
+
+    # 3. Configure Axis and Top Labels based on toggle
+    if mode == "Absolute Zahlen":
+        y_col = 'key'
+        y_title = 'Anzahl Tickets'
+        y_format = None
+
+        # Labels for top of bars
+        y_text_pos = group_totals['key']
+        text_content = group_totals['key'].astype(str)
+        # Add 15% buffer to Y-axis max so labels fit
+        y_max = group_totals['key'].max() * 1.15
+    else:
+        y_col = 'percentage'
+        y_title = 'Prozentualer Anteil'
+        y_format = '.0%'
+
+        # Labels for top of bars (always at 100%)
+        y_text_pos = [1] * len(group_totals)
+        # Show "Total: N" so context isn't lost in percent mode
+        text_content = "Total: " + group_totals['key'].astype(str)
+        y_max = 1.15
+
+    # 4. Plot Main Bars
+    fig = px.bar(
+        result,
+        x=x_axis,
+        y=y_col,
+        color='request_type',
+        text='custom_label'
+    )
+
+    # Apply Bar Styling BEFORE adding Scatter trace
+    # This prevents the "Invalid property insidetextanchor" error
+    fig.update_traces(
+        textposition='inside',
+        insidetextanchor='middle'
+    )
+    fig = apply_font(fig)
+
+    # 5. Add Scatter Trace for Totals
+    fig.add_trace(
+        go.Scatter(
+            x=group_totals[x_axis],
+            y=y_text_pos,
+            text=text_content,
+            mode='text',
+            textposition='top center',
+            textfont=dict(size=12, color='black', weight='bold'),
+            showlegend=False,
+            hoverinfo='skip'
+        )
+    )
+
+    # 6. Final Layout Updates
+    fig.update_xaxes(title_text=x_axis_label)
+    fig.update_yaxes(title_text=y_title, tickformat=y_format, range=[0, y_max])
+    return fig
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+@timed("figure.open_status")
+def open_status_figure(version, start, end, firmas, search=None):
+    result = aggregate('open_status_counts', version, start, end, firmas, search=search)
+    if _empty(result):
+        return None
+    result['status_key'] = result['status'].astype(str) + ' (' + result['key'].astype(str) + ')'
+    # status_category on x axis, stacked by status, with status and count inside of bars
+    fig = px.bar(result, x='status_category', y='key', color='status', text='status_key')
+    # add labels inside of bars
+    fig.update_traces(
+        textposition='inside',
+        insidetextanchor='middle'
+    )
+    # add y axis label
+    fig.update_yaxes(title_text='Anzahl Tickets')
+    fig.update_xaxes(title_text='Statuskategorie')
+    #remove legend
+    fig.update_layout(showlegend=False)
+    fig = apply_font(fig)
+    return fig
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+@timed("figure.resolution_bins")
+def resolution_bins_figure(version, start, end, firmas, search=None):
+    # time to resolution bin counts, in bin order
+    result = aggregate('resolution_bin_counts', version, start, end, firmas, search=search)
+    if result['key'].sum() == 0:
+        return None
+    fig = px.bar(result, x='time_to_resolution_bin', y='key')
+
+    fig.update_layout(
+        title='Anzahl Fertige Tickets nach Bearbeitungszeit',
+    )
+    # add axis labels
+    fig.update_xaxes(title_text='Bearbeitungszeit in Stunden')
+    fig.update_yaxes(title_text='Anzahl Fertige Tickets')
+    # set width of plot
+    fig.update_layout(width=1000)
+    fig = apply_font(fig)
+    return fig
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+@timed("figure.resolution")
+def resolution_figure(version, start, end, firmas, x_axis, x_axis_label, search=None):
+    result = aggregate('resolution_counts', version, start, end, firmas, x_axis, search=search)
+    if _empty(result):
+        return None
+    fig = px.bar(result, x=x_axis, y='Anzahl', text='Anzahl', color='resolution')
+    fig.update_xaxes(title_text=x_axis_label)
+    fig.update_yaxes(title_text='Anzahl Fertige Tickets')
+    fig = apply_font(fig)
+    return fig
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+@timed("figure.customers")
+def customers_figure(version, start, end, firmas, limit=25, search=None):
+    result = aggregate('top_customers', version, start, end, firmas, limit, search=search)
+    if _empty(result):
+        return None
+    fig = px.bar(result, x='zentrale', y='Anzahl', text='Anzahl')
+    fig = apply_font(fig)
+    return fig
@@ -0,0 +1,380 @@
+import re
+import threading
+from functools import lru_cache
+
+import duckdb
+import pandas as pd
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data_loading import load_text, rollup_file, search_index_files, snapshot_version
+from data_transformation import RESOLUTION_BIN_LABELS, TEXT_COLUMNS, TICKET_COLUMNS
+from search_index import analyze
+from snapshot import KEEP_VERSIONS, open_snapshot, window_table
+
+# Dashboard aggregations, run by DuckDB on the daily rollups of the store
+# (data_transformation.ROLLUPS): a chart sums the counts `n` of the selected days
+# and firmas, so it costs the number of distinct groups, not of tickets. Weekly
+# views are rolled up from the days. The created window is applied per day, the
+# dashboard always selects whole days.
+#
+# Like the pandas groupbys they replace, rows with a NULL group key are dropped.
+#
+# With a full-text `search`, the same aggregations run on the matching tickets
+# instead of the rollups (see search_tickets).
+#
+# Every query reads one published snapshot `version` (the current one if None):
+# its rollups and its memory-mapped ticket table, so the results of a dashboard
+# run all belong to the same generation, whatever a running sync is writing, and
+# are cached under that version. Only the text columns and the search index are
+# read from the store as they are; they are looked up by key.
+
+X_AXIS_COLUMNS = ('created_string', 'week_string')
+
+_con = None
+_con_guard = threading.Lock()
+
+
+def _cursor():
+    # one in-process database; every query runs on its own cursor (thread-safe)
+    global _con
+    with _con_guard:
+        if _con is None:
+            _con = duckdb.connect()
+        return _con.cursor()
+
+
+def _version(version):
+    return snapshot_version() if version is None else version
+
+
+@lru_cache(maxsize=KEEP_VERSIONS)
+def _snapshot(version):
+    # mapped once per version and process; a dropped version stays readable while mapped
+    return open_snapshot(version)
+
+
+def _tickets_cursor(version, start, end, firmas):
+    """
+    A cursor with the tickets of the window in snapshot `version` registered as
+    `tickets` (a zero-copy slice), or None if nothing is published yet.
+    """
+    version = _version(version)
+    if version is None:
+        return None
+    cursor = _cursor()
+    cursor.register('tickets', window_table(_snapshot(version), start, end, firmas))
+    return cursor
+
+
+def _query(select, start, end, firmas, where=(), group_by=(), order_by=None, limit=None, rollup='tickets', search=None,
+           version=None):
+    """
+    Run `SELECT <select> FROM <rollup> WHERE ... GROUP BY ...` over the days of the
+    created window [start, end] and the firmas, or over the tickets matching
+    `search` (each counted once in `n`), in snapshot `version`. Returns None if
+    there is no data.
+    """
+    version = _version(version)
+    if search:
+        cursor = _tickets_cursor(version, start, end, firmas)
+        if cursor is None:
+            return None
+        match, match_args = _search_condition(start, end, firmas, search)
+        source, source_args = f"(SELECT *, 1 AS n FROM tickets WHERE {match})", match_args
+    else:
+        path = rollup_file(rollup, version)
+        if path is None:
+            return None
+        cursor = _cursor()
+        source, source_args = "read_parquet(?)", [path]
+    conditions, args = list(where), []
+    if start is not None:
+        conditions.append("created_string >= ?")
+        args.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        conditions.append("created_string <= ?")
+        args.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    if firmas is not None:
+        conditions.append(f"firma IN ({', '.join('?' * len(firmas))})")
+        args.extend(firmas)
+    conditions.extend(f"{col} IS NOT NULL" for col in group_by)
+
+    sql = f"SELECT {select} FROM {source}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if group_by:
+        sql += " GROUP BY " + ", ".join(group_by)
+    if order_by or group_by:
+        sql += " ORDER BY " + (order_by or ", ".join(group_by))
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return cursor.execute(sql, [*source_args, *args]).df()
+
+
+def _x_axis(x_axis):
+    # x_axis is put into the SQL text, so only the known columns are allowed
+    if x_axis not in X_AXIS_COLUMNS:
+        raise ValueError(f"Unknown x axis column: {x_axis}")
+    return x_axis
+
+
+def ticket_count(start=None, end=None, firmas=None, search=None, version=None):
+    result = _query("CAST(coalesce(sum(n), 0) AS BIGINT) AS n", start, end, firmas, search=search, version=version)
+    return 0 if result is None else int(result['n'].iloc[0])
+
+
+def status_counts(start, end, firmas, x_axis, search=None, version=None):
+    """Overview: tickets per x-axis value and status (count in `key`)."""
+    x_axis = _x_axis(x_axis)
+    return _query(f"{x_axis}, status, CAST(sum(n) AS BIGINT) AS key", start, end, firmas, group_by=(x_axis, 'status'),
+                  search=search, version=version)
+
+
+def category_resolution_counts(start, end, firmas, search=None, version=None):
+    """Tickets per Hauptkategorie and resolution (count in `Anzahl`)."""
+    return _query("Hauptkategorie, resolution, CAST(sum(n) AS BIGINT) AS Anzahl", start, end, firmas,
+                  group_by=('Hauptkategorie', 'resolution'), search=search, version=version)
+
+
+def subcategory_counts(start, end, firmas, search=None, version=None):
+    """Tickets per Hauptkategorie and Unterkategorie, largest first."""
+    return _query("Hauptkategorie, Unterkategorie, CAST(sum(n) AS BIGINT) AS Anzahl", start, end, firmas,
+                  group_by=('Hauptkategorie', 'Unterkategorie'), order_by="Anzahl DESC, Hauptkategorie, Unterkategorie",
+                  search=search, version=version)
+
+
+def request_type_counts(start, end, firmas, x_axis, search=None, version=None):
+    """Tickets with a request type per request type and x-axis value (count in `key`)."""
+    x_axis = _x_axis(x_axis)
+    return _query(f"request_type, {x_axis}, CAST(sum(n) AS BIGINT) AS key", start, end, firmas,
+                  where=("request_type <> ''",), group_by=('request_type', x_axis), search=search, version=version)
+
+
+def open_status_counts(start, end, firmas, search=None, version=None):
+    """Tickets that are not done per status category and status, largest first."""
+    return _query("status_category, status, CAST(sum(n) AS BIGINT) AS key", start, end, firmas,
+                  where=("status_category <> 'Fertig'",), group_by=('status_category', 'status'),
+                  order_by="key DESC, status_category, status", search=search, version=version)
+
+
+def resolution_bin_counts(start, end, firmas, search=None, version=None):
+    """Done tickets per time-to-resolution bin; every bin is listed, in bin order."""
+    result = _query("time_to_resolution_bin, CAST(sum(n) AS BIGINT) AS key", start, end, firmas,
+                    where=("currentstatus_name = 'Fertig'",), group_by=('time_to_resolution_bin',), search=search,
+                    version=version)
+    counts = pd.Series(dtype='int64') if result is None else result.set_index('time_to_resolution_bin')['key']
+    counts = counts.reindex(RESOLUTION_BIN_LABELS, fill_value=0).astype('int64')
+    return counts.rename_axis('time_to_resolution_bin').reset_index(name='key')
+
+
+def resolution_counts(start, end, firmas, x_axis, search=None, version=None):
+    """Done tickets per x-axis value and resolution (count in `Anzahl`)."""
+    x_axis = _x_axis(x_axis)
+    return _query(f"{x_axis}, resolution, CAST(sum(n) AS BIGINT) AS Anzahl", start, end, firmas,
+                  where=("status_category = 'Fertig'",), group_by=(x_axis, 'resolution'), search=search,
+                  version=version)
+
+
+def top_customers(start, end, firmas, limit=25, search=None, version=None):
+    """Done tickets per zentrale, the `limit` largest."""
+    return _query("zentrale, CAST(sum(n) AS BIGINT) AS Anzahl", start, end, firmas,
+                  where=("status_category = 'Fertig'",), group_by=('zentrale',),
+                  order_by="Anzahl DESC, zentrale", limit=limit, rollup='zentrale', search=search, version=version)
+
+
+# -------------------------------
+# Raw ticket rows, one page at a time
+# -------------------------------
+# Filtering, sorting and paging run on the tickets of the window in the snapshot;
+# only the rows and columns of the requested page are returned. The text columns live
+# in the side store and are joined for the rows of the page only.
+
+def _ticket_column(col):
+    # column names are put into the SQL text, so only the known columns are allowed
+    if col not in TICKET_COLUMNS or col in TEXT_COLUMNS:
+        raise ValueError(f"Unknown ticket column: {col}")
+    return f'"{col}"'
+
+
+def _ticket_where(start, end, firmas, filters, search=None):
+    conditions, args = [], []
+    if search:
+        match, match_args = _search_condition(start, end, firmas, search)
+        conditions.append(match)
+        args.extend(match_args)
+    if start is not None:
+        conditions.append("created >= ?")
+        args.append(pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        conditions.append("created <= ?")
+        args.append(pd.Timestamp(end).to_pydatetime())
+    if firmas is not None:
+        conditions.append(f"firma IN ({', '.join('?' * len(firmas))})")
+        args.extend(firmas)
+    # case-insensitive substring filter per column; % and _ in the text match literally
+    for col, text in filters or ():
+        conditions.append(f"CAST({_ticket_column(col)} AS VARCHAR) ILIKE ? ESCAPE '\\'")
+        args.append("%" + re.sub(r"([\\%_])", r"\\\1", text) + "%")
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), args
+
+
+def ticket_row_count(start, end, firmas, filters=(), search=None, version=None):
+    """Number of tickets of the window that match `filters` ((column, text) pairs) and `search`."""
+    cursor = _tickets_cursor(version, start, end, firmas)
+    if cursor is None:
+        return 0
+    where, args = _ticket_where(start, end, firmas, filters, search)
+    return int(cursor.execute(f"SELECT count(*) AS n FROM tickets{where}", args).fetchone()[0])
+
+
+def ticket_page(start, end, firmas, columns, sort_by='created', descending=True, filters=(), page=0, page_size=100,
+                search=None, version=None):
+    """
+    Rows `page * page_size` to `(page + 1) * page_size` of the tickets of the window
+    that match `filters` and `search`, sorted by `sort_by` (then key), with the given columns.
+    """
+    text_cols = [col for col in columns if col in TEXT_COLUMNS]
+    table_cols = [col for col in columns if col not in TEXT_COLUMNS]
+    select = list(dict.fromkeys(['key', *table_cols]))
+    cursor = _tickets_cursor(version, start, end, firmas)
+    if cursor is None:
+        return pd.DataFrame(columns=columns)
+    where, args = _ticket_where(start, end, firmas, filters, search)
+    direction = "DESC" if descending else "ASC"
+    sql = (
+        f"SELECT {', '.join(_ticket_column(col) for col in select)}"
+        f" FROM tickets{where}"
+        f" ORDER BY {_ticket_column(sort_by)} {direction} NULLS LAST, key LIMIT ? OFFSET ?"
+    )
+    result = cursor.execute(sql, [*args, int(page_size), int(page) * int(page_size)]).df()
+    if text_cols and len(result):
+        text = load_text(result['key'], start=start, end=end, firmas=firmas)[['key', *text_cols]]
+        result = result.merge(text, on='key', how='left')
+    # an empty page has no text columns to join
+    return result.reindex(columns=columns)
+
+
+# -------------------------------
+# Ad-hoc SQL for the exploration view
+# -------------------------------
+EXPLORE_ROW_LIMIT = 1000
+# resources of one ad-hoc query, so it cannot starve the dashboard
+EXPLORE_MEMORY_LIMIT = "1GB"
+EXPLORE_THREADS = 2
+
+
+def search_window(table, start, end, firmas, search=None):
+    """The tickets of the window (see snapshot.window_table), only those matching `search` if given."""
+    window = window_table(table, start, end, firmas)
+    if search:
+        window = window.filter(pc.is_in(window['key'], pa.array(search_keys(start, end, firmas, search), pa.string())))
+    return window
+
+
+def explore_sql(start, end, firmas, sql, limit=EXPLORE_ROW_LIMIT, search=None, version=None):
+    """
+    Run a user query against the table `tickets` (the tickets of the window that
+    match `search`) and return at most `limit` rows. The query runs on the
+    memory-mapped snapshot in its own database, without access to files or
+    settings and with bounded memory and threads, and must be a single SELECT
+    statement (checked by DuckDB's parser, not by the text).
+    """
+    con = duckdb.connect()
+    statements = con.extract_statements(sql)
+    if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+        raise duckdb.InvalidInputException("Only a single SELECT statement is allowed")
+    # the window is a zero-copy slice of the snapshot
+    con.register('tickets', search_window(_snapshot(_version(version)), start, end, firmas, search))
+    con.execute("SET enable_external_access = false")
+    con.execute(f"SET memory_limit = '{EXPLORE_MEMORY_LIMIT}'")
+    con.execute(f"SET threads = {int(EXPLORE_THREADS)}")
+    con.execute("SET lock_configuration = true")
+    # wrapping the query bounds the result; the line break ends a trailing comment
+    query = statements[0].query.strip().rstrip(";")
+    return con.execute(f"SELECT * FROM ({query}\n) AS q LIMIT {int(limit)}").df()
+
+
+# -------------------------------
+# Full-text search
+# -------------------------------
+# BM25 over the search index (search_index.py) of the tickets of the window. A
+# ticket matches if it contains every term of the query; the collection
+# statistics (number of tickets, average length) are those of the window.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _search_sql(start, end, firmas, search):
+    """
+    SQL (and its parameters) of the BM25 scores (key, score) of the tickets of the
+    window matching `search`, unordered; None if nothing can match.
+    """
+    terms = list(dict.fromkeys(analyze(search)))
+    if not terms:
+        return None
+    term_files, doc_files = search_index_files(start, end, firmas)
+    if not doc_files or not term_files:
+        return None
+    where, args = _ticket_where(start, end, firmas, ())
+    sql = f"""
+        WITH docs AS (SELECT key, length FROM read_parquet(?){where}),
+        stats AS (SELECT count(*) AS n, avg(length) AS avgdl FROM docs),
+        hits AS (
+            SELECT p.term, p.key, p.tf, d.length
+            FROM read_parquet(?) AS p JOIN docs AS d USING (key)
+            WHERE p.term IN ({', '.join('?' * len(terms))})
+        ),
+        df AS (SELECT term, count(*) AS df FROM hits GROUP BY term)
+        SELECT h.key,
+               sum(ln(1 + (s.n - df.df + 0.5) / (df.df + 0.5))
+                   * h.tf * ({BM25_K1} + 1) / (h.tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * h.length / s.avgdl))) AS score
+        FROM hits AS h JOIN df USING (term) CROSS JOIN stats AS s
+        GROUP BY h.key
+        HAVING count(*) = ?
+    """
+    return sql, [doc_files, *args, term_files, *terms, len(terms)]
+
+
+def _search_condition(start, end, firmas, search):
+    # a semi-join on the hits, computed in the same query: no key list goes through Python
+    search_sql = _search_sql(start, end, firmas, search)
+    if search_sql is None:
+        return "FALSE", []
+    sql, args = search_sql
+    return f"key IN (SELECT key FROM ({sql}))", args
+
+
+def search_tickets(start, end, firmas, search, limit=None):
+    """Keys of the tickets of the window matching `search`, best match first (score in `score`)."""
+    search_sql = _search_sql(start, end, firmas, search)
+    if search_sql is None:
+        return pd.DataFrame({'key': pd.Series(dtype=object), 'score': pd.Series(dtype='float64')})
+    sql, args = search_sql
+    sql += " ORDER BY score DESC, h.key"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return _cursor().execute(sql, args).df()
+
+
+def search_keys(start, end, firmas, search):
+    """All keys of the tickets of the window matching `search`."""
+    return search_tickets(start, end, firmas, search)['key'].tolist()
+
+
+def search_results(start, end, firmas, search, columns, limit=200, version=None):
+    """The `limit` best matches of `search` with the given ticket columns and their score, best first."""
+    search_sql = _search_sql(start, end, firmas, search)
+    cursor = _tickets_cursor(version, start, end, firmas)
+    if search_sql is None or cursor is None:
+        return pd.DataFrame(columns=[*columns, 'score'])
+    sql, args = search_sql
+    select = list(dict.fromkeys(['key', *columns]))
+    sql = (
+        f"WITH hits AS ({sql} ORDER BY score DESC, h.key LIMIT {int(limit)})"
+        f" SELECT {', '.join(f't.{_ticket_column(col)}' for col in select)}, hits.score"
+        f" FROM tickets AS t JOIN hits USING (key)"
+        f" ORDER BY hits.score DESC, t.key"
+    )
+    return cursor.execute(sql, args).df()[[*columns, 'score']]
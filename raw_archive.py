@@ -0,0 +1,136 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+# Raw Jira search results, partitioned by project and sync run:
+#   data/raw/<project>/<run_id>.ndjson.gz
+# Every fetched page is appended as its own gzip member of NDJSON lines, so the
+# fetch never has to hold or rewrite the whole result, and gzip readers see one
+# continuous stream of issues.
+#
+# Every sync adds a run file, so sync.py compacts the archive once a project has
+# more than twice RAW_KEEP_RUNS runs (see compact_runs): the newest RAW_KEEP_RUNS
+# runs stay as they are, the older ones are merged into a single run with the
+# newest version of every issue. Replaying the archive into the store gives the
+# same tickets before and after. RAW_KEEP_RUNS=0 turns compaction off; deleting
+# old runs (and the history only they hold) is then up to the operator.
+RAW_ARCHIVE_DIR = "data/raw"
+RAW_KEEP_RUNS = int(os.getenv("RAW_KEEP_RUNS", "100"))
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def new_run_id():
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def archive_path(project, run_id):
+    return os.path.join(RAW_ARCHIVE_DIR, project, f"{run_id}.ndjson.gz")
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def append_page(project, run_id, issues):
+    """Append one page of raw issues to the archive of a project's sync run."""
+    if not issues:
+        return
+    path = archive_path(project, run_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = "".join(json.dumps(issue, ensure_ascii=False) + "\n" for issue in issues)
+    data = gzip.compress(payload.encode("utf-8"), compresslevel=6)
+    # shards of the same project fetch concurrently into the same run file
+    with _lock_for(path):
+        with open(path, "ab") as f:
+            f.write(data)
+
+
+def list_runs(project=None):
+    """Archived (project, run_id) pairs, oldest run first."""
+    if project:
+        projects = [project]
+    elif os.path.isdir(RAW_ARCHIVE_DIR):
+        projects = os.listdir(RAW_ARCHIVE_DIR)
+    else:
+        projects = []
+    runs = []
+    for p in projects:
+        directory = os.path.join(RAW_ARCHIVE_DIR, p)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if name.endswith(".ndjson.gz"):
+                runs.append((p, name[:-len(".ndjson.gz")]))
+    return sorted(runs, key=lambda run: (run[1], run[0]))
+
+
+def _iter_lines(paths):
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def iter_raw_issues(project=None, run_id=None):
+    """
+    Replay archived raw issues one at a time, oldest run first.
+    Filter by project and/or run; later runs may repeat issues with newer versions.
+    """
+    for p, r in list_runs(project):
+        if run_id is not None and r != run_id:
+            continue
+        for line in _iter_lines([archive_path(p, r)]):
+            yield json.loads(line)
+
+
+def _updated(issue):
+    try:
+        return datetime.fromisoformat(issue["fields"]["updated"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        # versions without a usable timestamp lose against any other
+        return float("-inf")
+
+
+def compact_runs(project, keep=RAW_KEEP_RUNS):
+    """
+    Merge all but the newest `keep` runs of a project into one run, named after the
+    newest merged run, once there are more than 2 * keep. Only the newest version
+    of every issue is kept, as in the upsert. The merged runs are read twice (first
+    for the versions) instead of being held in memory. Returns the number of runs
+    merged.
+    Run it under the store's sync lock, so no fetch appends to the merged runs.
+    """
+    runs = list_runs(project)
+    if keep <= 0 or len(runs) <= 2 * keep:
+        return 0
+    merged = runs[:-keep]
+    paths = [archive_path(p, r) for p, r in merged]
+    # line number of the newest version (by `updated`, then the later one) of every issue
+    newest = {}
+    for n, line in enumerate(_iter_lines(paths)):
+        issue = json.loads(line)
+        version = (_updated(issue), n)
+        if version >= newest.get(issue["key"], version):
+            newest[issue["key"]] = version
+    keep_lines = {n for _, n in newest.values()}
+    target = paths[-1]
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+            for n, line in enumerate(_iter_lines(paths)):
+                if n in keep_lines:
+                    f.write(line)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    for path in paths[:-1]:
+        os.remove(path)
+    return len(merged)
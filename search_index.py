@@ -0,0 +1,95 @@
+import re
+
+import pandas as pd
+
+# Full-text search over summary, description and comments of the tickets.
+# Every ticket is one document; the index stores per document its length and per
+# (term, document) the term frequency, partitioned like the ticket store (see
+# data_loading.update_search_index), so an upsert only re-indexes the fetched
+# tickets. Queries are ranked with BM25 (queries.search_tickets).
+#
+# Terms are normalized for German text: case-folded (ß -> ss), umlauts written
+# out (ä -> ae, so "Drucker" and "Druecker" match), stopwords dropped and light
+# suffix stemming (CISTEM-style: "Druckern", "Druckers", "Drucker" -> "druck").
+
+SEARCH_COLUMNS = ['summary', 'description', 'comments']
+TRANSLITERATION = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue'})
+TOKEN_PATTERN = r'[^\W_]+'
+MIN_TERM_LENGTH = 2
+
+STOPWORDS = set("""
+aber alle allem allen aller alles als also am an ander andere anderem anderen anderer anderes auch auf aus bei
+beim bin bis bist da damit dann das dass dein deine dem den denn der des dessen die dies diese diesem diesen
+dieser dieses doch dort du durch ein eine einem einen einer eines einige er es etwas euch euer fuer gegen
+gewesen hab habe haben hat hatte hatten hier hin hinter ich ihm ihn ihnen ihr ihre im in indem ins ist ja jede
+jedem jeden jeder jedes jetzt kann kein keine koennen konnte man manche mein meine mich mir mit muss nach nicht
+nichts noch nun nur ob oder ohne sehr sein seine sich sie sind so solche soll sollte sondern sonst ueber um und
+uns unser unter vom von vor wann war waren warum was weil welche wenn wer werde werden wie wieder wir wird
+wo wollen wuerde zu zum zur zwischen
+hallo bitte danke vielen dank freundlichen gruessen gruss gruesse mfg lg
+a an and are as at be by for from has have in is it of on or the this to was with
+""".split())
+
+
+def stem(token):
+    """Strip common German inflection suffixes (CISTEM-style); numbers and codes are kept as they are."""
+    if any(c.isdigit() for c in token):
+        return token
+    # as in CISTEM, sch/ei/ie and doubled letters count as one letter, so "kaputt"
+    # or "Kasse" keep their last consonant
+    token = re.sub(r'(.)\1', r'\1*', token.replace('sch', '$').replace('ei', '%').replace('ie', '&'))
+    while len(token) > 3:
+        if len(token) > 5 and token[-2:] in ('em', 'er', 'nd'):
+            token = token[:-2]
+        elif token[-1] in 'tesn':
+            token = token[:-1]
+        else:
+            break
+    token = re.sub(r'(.)\*', r'\1\1', token)
+    return token.replace('$', 'sch').replace('%', 'ei').replace('&', 'ie')
+
+
+def normalize(text):
+    """Case-folded text with the umlauts written out."""
+    return text.casefold().translate(TRANSLITERATION)
+
+
+def _term_map(tokens):
+    # stemming and stopwords per distinct token, not per occurrence
+    return {
+        token: stem(token)
+        for token in tokens
+        if len(token) >= MIN_TERM_LENGTH and token not in STOPWORDS
+    }
+
+
+def analyze(text):
+    """The terms of a text (e.g. a search query), in order, with duplicates."""
+    tokens = re.findall(TOKEN_PATTERN, normalize(text))
+    terms = _term_map(set(tokens))
+    return [terms[token] for token in tokens if token in terms]
+
+
+def index_documents(df):
+    """
+    Index the tickets in `df` (key, firma, created and the SEARCH_COLUMNS that are
+    present). Returns the postings (term, key, tf) and the documents (key, firma,
+    created, length in terms).
+    """
+    df = df.reset_index(drop=True)
+    text = pd.Series('', index=df.index)
+    for col in SEARCH_COLUMNS:
+        if col in df.columns:
+            text = text + ' ' + df[col].astype(object).fillna('').astype(str)
+    tokens = text.str.casefold().str.translate(TRANSLITERATION).str.findall(TOKEN_PATTERN).explode().dropna()
+    terms = tokens.map(_term_map(tokens.unique())).dropna()
+    postings = (
+        pd.DataFrame({'key': df['key'].to_numpy()[terms.index.to_numpy()], 'term': terms.to_numpy()})
+        if len(terms) else pd.DataFrame({'key': pd.Series(dtype=object), 'term': pd.Series(dtype=object)})
+    )
+    postings = postings.groupby(['term', 'key'], sort=True).size().reset_index(name='tf')
+    postings['tf'] = postings['tf'].astype('int32')
+    lengths = postings.groupby('key')['tf'].sum()
+    docs = df[['key', 'firma', 'created']].reset_index(drop=True)
+    docs['length'] = docs['key'].map(lengths).fillna(0).astype('int32')
+    return postings, docs
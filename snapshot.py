@@ -0,0 +1,158 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from metrics import timed
+
+# Read-only snapshot of the whole ticket table for the dashboard:
+#   data/snapshot/tickets-<version>.arrow   uncompressed Arrow IPC file
+#   data/snapshot/<name>-<version>.parquet  files published with it (the rollups)
+#   data/snapshot/CURRENT                   version of the published snapshot
+# The file is memory-mapped, so every session of a process (and every process on
+# the box) shares the same pages instead of holding its own copy. A new snapshot
+# is written under new names and published by swapping CURRENT, so readers of a
+# version see either the old or the new tables, never a mix.
+SNAPSHOT_DIR = "data/snapshot"
+CURRENT_PATH = os.path.join(SNAPSHOT_DIR, "CURRENT")
+# published versions kept on disk; a reader may still be opening the previous one
+KEEP_VERSIONS = 2
+# The snapshot is sorted by (firma, created), with the row range of every firma in
+# the schema metadata, so a date window is found by binary search and is a
+# zero-copy slice of the mapped file.
+FIRMA_OFFSETS_KEY = b"firma_offsets"
+
+
+def snapshot_path(version):
+    return os.path.join(SNAPSHOT_DIR, f"tickets-{version}.arrow")
+
+
+def snapshot_file(name, version):
+    return os.path.join(SNAPSHOT_DIR, f"{name}-{version}.parquet")
+
+
+def _version_of(file_name):
+    # "<name>-<version>.<ext>"; the version has no "-"
+    return file_name.rsplit("-", 1)[-1].split(".", 1)[0]
+
+
+def current_version():
+    """Version of the published snapshot, or None if there is none yet."""
+    try:
+        with open(CURRENT_PATH) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _sorted_by_firma_created(table):
+    """
+    The table sorted by (firma, created), with the row range of every firma in the
+    schema metadata: {firma: [start, stop of the rows with a created date, stop]}.
+    Rows without a created date are at the end of their firma's range.
+    """
+    keys = pa.table({
+        'firma': table.column('firma').cast(pa.string()),
+        'created': table.column('created'),
+    })
+    order = pc.sort_indices(keys, sort_keys=[('firma', 'ascending'), ('created', 'ascending')], null_placement='at_end')
+    table = table.take(order)
+    firma = table.column('firma').cast(pa.string()).to_numpy(zero_copy_only=False)
+    dated = table.column('created').is_valid().to_numpy(zero_copy_only=False)
+    names, starts = np.unique(firma, return_index=True)
+    stops = [*starts[1:], len(firma)] if len(names) else []
+    offsets = {
+        str(name): [int(start), int(start + dated[start:stop].sum()), int(stop)]
+        for name, start, stop in zip(names, starts, stops)
+    }
+    metadata = {**(table.schema.metadata or {}), FIRMA_OFFSETS_KEY: json.dumps(offsets).encode()}
+    return table.replace_schema_metadata(metadata)
+
+
+@timed("snapshot.publish")
+def publish_snapshot(table, files=None):
+    """
+    Write `table` as a new snapshot, with a frozen copy of every file in `files`
+    ({name: path}, see snapshot_file), make it current and drop older versions.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    version = pd.Timestamp.now(tz="UTC").strftime("%Y%m%dT%H%M%S%fZ")
+    for name, path in (files or {}).items():
+        # a hard link keeps the current contents when the store file is replaced
+        target = snapshot_file(name, version)
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copyfile(path, target)
+    # an IPC file holds one dictionary per column, and one contiguous chunk reads fastest
+    table = _sorted_by_firma_created(table.unify_dictionaries().combine_chunks())
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+    os.close(fd)
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, snapshot_path(version))
+
+    fd, tmp_current = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+    os.replace(tmp_current, CURRENT_PATH)
+
+    # mapped files stay readable after they are unlinked
+    versions = sorted(_version_of(name) for name in os.listdir(SNAPSHOT_DIR) if name.endswith(".arrow"))
+    dropped = set(versions[:-KEEP_VERSIONS])
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name.endswith((".arrow", ".parquet")) and _version_of(name) in dropped:
+            os.remove(os.path.join(SNAPSHOT_DIR, name))
+    return version
+
+
+def open_snapshot(version):
+    """The snapshot of `version` as an Arrow table backed by the memory-mapped file (no copy)."""
+    source = pa.memory_map(snapshot_path(version), "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+def window_slices(table, start=None, end=None, firmas=None):
+    """
+    (offset, length) row ranges of the tickets created in [start, end] for the given
+    firmas: one binary search per bound in each firma's sorted created range.
+    """
+    offsets = json.loads(table.schema.metadata[FIRMA_OFFSETS_KEY])
+    created = table.column('created')
+    unit = created.type.unit
+    slices = []
+    for firma, (first, dated_stop, stop) in offsets.items():
+        if firmas is not None and firma not in firmas:
+            continue
+        if start is None and end is None:
+            slices.append((first, stop - first))
+            continue
+        # int64 view of the sorted, non-null created values of this firma
+        values = created.slice(first, dated_stop - first).to_numpy().view('int64')
+        lo = 0 if start is None else np.searchsorted(values, pd.Timestamp(start).as_unit(unit).value, 'left')
+        hi = len(values) if end is None else np.searchsorted(values, pd.Timestamp(end).as_unit(unit).value, 'right')
+        if hi > lo:
+            slices.append((first + int(lo), int(hi - lo)))
+    return slices
+
+
+def window_table(table, start=None, end=None, firmas=None):
+    """The tickets created in [start, end] for the given firmas, as zero-copy slices of `table`."""
+    if FIRMA_OFFSETS_KEY not in (table.schema.metadata or {}):
+        # snapshot published before the sorted layout
+        mask = pa.scalar(True)
+        if start is not None:
+            mask = pc.and_(mask, pc.greater_equal(table['created'], pa.scalar(pd.Timestamp(start), table['created'].type)))
+        if end is not None:
+            mask = pc.and_(mask, pc.less_equal(table['created'], pa.scalar(pd.Timestamp(end), table['created'].type)))
+        if firmas is not None:
+            mask = pc.and_(mask, pc.is_in(table['firma'].cast(pa.string()), pa.array(firmas, pa.string())))
+        return table if isinstance(mask, pa.Scalar) else table.filter(pc.fill_null(mask, False))
+    slices = [table.slice(offset, length) for offset, length in window_slices(table, start, end, firmas)]
+    return pa.concat_tables(slices) if slices else table.slice(0, 0)
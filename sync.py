@@ -0,0 +1,206 @@
+"""
+Sync Jira into the stored data outside the dashboard: fetch, transform, upsert and
+publish a new snapshot, which the dashboard picks up on its next rerun.
+
+Every sync holds the store's exclusive lock on data/sync.lock (see
+data_loading.sync_lock), so concurrent writers (a worker, a cron job, the refresh
+button, a backfill) run one after another instead of rewriting the same
+partitions at once. All files are written atomically, so readers never see a
+partial write.
+
+    python sync.py                                 # once, changes since the last sync
+    python sync.py --full --start 2025-12-01 --end 2025-12-31
+    python sync.py --every 15                      # long-lived worker, every 15 minutes
+    python sync.py --no-wait                       # skip if another sync is running (cron)
+
+The dashboard runs the same sync in the background (start_background_sync).
+After the upsert, the raw archive of every project is compacted once it has
+grown past raw_archive.RAW_KEEP_RUNS runs.
+"""
+import argparse
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from data_loading import load_data, sync_lock, upsert_data
+from jira_loader import PROJECTS, advance_watermarks, fetch_tickets, fetch_updated_tickets, get_watermark
+from metrics import timed
+from raw_archive import compact_runs
+
+# changes fetched by a first incremental sync, without a watermark or stored data
+DEFAULT_LOOKBACK = timedelta(days=7)
+MAX_ISSUES = 10000
+
+
+class SyncCancelled(Exception):
+    pass
+
+
+def sync(incremental=True, start_dt=None, end_dt=None, max_issues=MAX_ISSUES, wait=True, progress=None, cancel=None):
+    """
+    Fetch the changes since the last sync (incremental) or the tickets created in
+    [start_dt, end_dt] and upsert them under the sync lock. Returns (fetched,
+    changed) ticket counts, or None if `wait` is off and another sync is running.
+
+    `progress` (a dict) is kept up to date with the stage and the pages, issues and
+    rows done so far. Setting the `cancel` event stops the sync with SyncCancelled
+    after the current page; the upsert itself is not interrupted.
+    """
+    progress = {} if progress is None else progress
+    progress.update(stage="waiting", pages=0, issues=0, rows=0)
+
+    def on_page(project, n_issues):
+        progress["pages"] += 1
+        progress["issues"] += n_issues
+        if cancel is not None and cancel.is_set():
+            raise SyncCancelled()
+
+    with sync_lock(wait) as acquired:
+        if not acquired:
+            return None
+        progress["stage"] = "fetch"
+        # both projects (and several time shards of each) are fetched concurrently and
+        # transformed page by page as they arrive
+        with timed("refresh.fetch", incremental=incremental) as m:
+            if incremental:
+                default = start_dt or datetime.now(timezone.utc) - DEFAULT_LOOKBACK
+                df_updated = load_data(columns=['firma', 'updated'])
+                watermarks = {project: get_watermark(project, df_updated, default=default) for project in PROJECTS}
+                df_new = fetch_updated_tickets(watermarks, max_issues=max_issues, on_page=on_page)
+            else:
+                df_new = fetch_tickets({project: (start_dt, end_dt) for project in PROJECTS}, max_issues=max_issues,
+                                       on_page=on_page)
+            m["rows"] = len(df_new)
+        if cancel is not None and cancel.is_set():
+            raise SyncCancelled()
+        if len(df_new) == 0:
+            return 0, 0
+        progress["stage"] = "upsert"
+        # only the partitions the fetched tickets fall into are rewritten
+        with timed("refresh.upsert") as m:
+            rows = upsert_data(df_new)
+            m["rows"] = len(rows)
+        progress["rows"] = len(rows)
+        # only advance the watermarks once the fetched issues are persisted, and only
+        # after an incremental sync: a --full range may lie entirely in the past, its
+        # newest `updated` says nothing about the changes since the last sync
+        if incremental:
+            advance_watermarks(df_new)
+        # every sync archives a new run of raw pages; merges the old ones now and then
+        with timed("raw.compact"):
+            for project in PROJECTS:
+                compact_runs(project)
+        return len(df_new), len(rows)
+
+
+# -------------------------------
+# Background sync of the dashboard
+# -------------------------------
+# The refresh button starts the sync on a thread of the server process, so the
+# script run (and every session) stays interactive on the current snapshot; the
+# new snapshot is published atomically at the end of the upsert. One job per
+# process at a time; the last job stays readable for its progress and result.
+_job = None
+_job_lock = threading.Lock()
+
+
+class SyncJob:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.progress = {"stage": "waiting", "pages": 0, "issues": 0, "rows": 0}
+        self.cancel = threading.Event()
+        self.started = datetime.now(timezone.utc)
+        self.finished = None
+        # "running", then "done", "skipped" (another sync held the lock), "cancelled" or "failed"
+        self.state = "running"
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="background-sync", daemon=True)
+
+    @property
+    def running(self):
+        return self.state == "running"
+
+    def _run(self):
+        try:
+            self.result = sync(wait=False, progress=self.progress, cancel=self.cancel, **self.kwargs)
+            self.state = "skipped" if self.result is None else "done"
+        except SyncCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.error = e
+            self.state = "failed"
+        finally:
+            self.finished = datetime.now(timezone.utc)
+
+
+def start_background_sync(**kwargs):
+    """Start a sync (see `sync` for the arguments) on a background thread; returns the running job."""
+    global _job
+    with _job_lock:
+        if _job is None or not _job.running:
+            _job = SyncJob(**kwargs)
+            _job.thread.start()
+        return _job
+
+
+def background_sync():
+    """The running or last finished background sync of this process, or None."""
+    return _job
+
+
+def run_worker(every, stop, **kwargs):
+    """Sync every `every` minutes until `stop` is set; a failed sync is retried on the next tick."""
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            result = sync(**kwargs)
+            if result is None:
+                print("Another sync is running, skipped.")
+            else:
+                print(f"{datetime.now(timezone.utc):%Y-%m-%d %H:%M:%S} "
+                      f"{result[0]} tickets fetched, {result[1]} changed.")
+        except Exception as e:
+            print(f"Sync failed: {e!r}")
+        stop.wait(max(0.0, every * 60 - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync JIRA tickets into the stored data.")
+    parser.add_argument("--full", action="store_true",
+                        help="fetch the tickets created in --start..--end instead of the changes since the last sync")
+    parser.add_argument("--start", help="first created date (YYYY-MM-DD); with --full, or the start of a first sync")
+    parser.add_argument("--end", help="last created date (YYYY-MM-DD), default today")
+    parser.add_argument("--max-issues", type=int, default=MAX_ISSUES, help="per project")
+    parser.add_argument("--every", type=float, help="keep running and sync every EVERY minutes")
+    parser.add_argument("--no-wait", action="store_true", help="skip instead of waiting if another sync is running")
+    args = parser.parse_args()
+
+    if args.full and not args.start:
+        parser.error("--full needs --start")
+    start_dt = pd.Timestamp(args.start, tz="UTC") if args.start else None
+    end_dt = (pd.Timestamp(args.end, tz="UTC") if args.end else pd.Timestamp.now(tz="UTC").normalize()) \
+        + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    kwargs = dict(incremental=not args.full, start_dt=start_dt, end_dt=end_dt, max_issues=args.max_issues,
+                  wait=not args.no_wait)
+
+    if args.every is None:
+        result = sync(**kwargs)
+        if result is None:
+            print("Another sync is running, skipped.")
+        else:
+            print(f"{result[0]} tickets fetched, {result[1]} changed.")
+        return
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    print(f"Syncing every {args.every:g} minutes.")
+    run_worker(args.every, stop, **kwargs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+import shutil
+
+import pytest
+
+from benchmarks.synthetic import generate_issues
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty working directory with data/object_id_to_name.json; the store is written relative to it."""
+    os.makedirs(tmp_path / "data")
+    shutil.copy(os.path.join(REPO_DIR, "data", "object_id_to_name.json"), tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def issues(workdir):
+    """Raw synthetic issues of both projects (SDIPR, SDAX), in an empty working directory."""
+    ipro = list(generate_issues(300, project="SDIPR", seed=1))
+    amparex = list(generate_issues(200, project="SDAX", seed=2))
+    return ipro, amparex
@@ -0,0 +1,34 @@
+"""Helpers of the store tests: synthetic tickets upserted in steps and the derived data read back."""
+import pandas as pd
+import pyarrow.parquet as pq
+
+from benchmarks.synthetic import generate_updates
+from data_loading import SEARCH_DOCS, SEARCH_TERMS, rollup_path, search_index_files, sync_lock, upsert_data
+from data_transformation import ROLLUPS, concat_tickets, load_issues
+
+
+def transformed(*issue_lists):
+    return concat_tickets([load_issues(list(issues), firma) for issues, firma in issue_lists])
+
+
+def read_rollups():
+    result = {}
+    for name in ROLLUPS:
+        rollup = pq.read_table(rollup_path(name)).to_pandas().astype(object)
+        result[name] = rollup.sort_values(list(rollup.columns), ignore_index=True)
+    return result
+
+
+def read_search_index():
+    result = {}
+    for table, files, order in zip((SEARCH_TERMS, SEARCH_DOCS), search_index_files(), (['term', 'key'], ['key'])):
+        index = pd.concat([pq.read_table(f).to_pandas() for f in files]).astype({'key': str})
+        result[table] = index.sort_values(order, ignore_index=True)
+    return result
+
+
+def upsert_in_steps(ipro, amparex):
+    with sync_lock():
+        upsert_data(transformed((ipro[:150], "IPRO"), (amparex[:50], "Amparex")))
+        upsert_data(transformed((ipro[100:], "IPRO"), (amparex[50:], "Amparex")))
+        upsert_data(transformed((generate_updates(ipro, 0.3), "IPRO"), (generate_updates(amparex, 0.3), "Amparex")))
@@ -0,0 +1,67 @@
+import datetime
+import os
+import shutil
+import sys
+import types
+from unittest import mock
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import queries
+from store_data import upsert_in_steps
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+YEAR = (datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))
+# the created window the app filters for YEAR
+WINDOW = (datetime.datetime.combine(YEAR[0], datetime.time.min, datetime.timezone.utc),
+          datetime.datetime.combine(YEAR[1], datetime.time.max, datetime.timezone.utc))
+
+
+@pytest.fixture
+def renderer(issues, monkeypatch):
+    """The dashboard on a store of synthetic tickets, with pygwalker's renderer replaced by a mock."""
+    upsert_in_steps(*issues)
+    shutil.copy(os.path.join(os.path.dirname(APP_PATH), "data", "evex_logo.png"), "data")
+    renderer = mock.MagicMock()
+    monkeypatch.setitem(sys.modules, "pygwalker.api.streamlit", types.SimpleNamespace(StreamlitRenderer=renderer))
+    return renderer
+
+
+def interactive_view(search=""):
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    # the default window (the last week) has no tickets, the views appear once it is set
+    at.run()
+    at.sidebar.radio[0].set_value("Beide")
+    at.sidebar.date_input[0].set_value(YEAR)
+    at.sidebar.text_input(key="search").set_value(search).run()
+    at.radio(key="view").set_value("📄 Interaktiv").run()
+    assert not at.exception
+    return at
+
+
+def test_explorer_gets_the_scalar_columns_of_the_window_computed_server_side(renderer):
+    at = interactive_view()
+    (df,), kwargs = renderer.call_args
+    assert kwargs == {"kernel_computation": True}
+    assert not {"labels", "category", "description", "comments"} & set(df.columns)
+    assert len(df) == queries.ticket_count(*WINDOW)
+    renderer.return_value.explorer.assert_called_once()
+    # the SQL box runs its default query on the same window
+    assert at.dataframe[0].value["Anzahl"].sum() == len(df)
+
+
+def test_explorer_follows_the_search(renderer):
+    # the synthetic summaries end with the ticket's number
+    interactive_view(search="17")
+    (df,), _ = renderer.call_args
+    assert sorted(df['key']) == ['SDAX-100000017', 'SDIPR-100000017']
+
+
+@pytest.mark.parametrize("sql", ["DELETE FROM tickets", "SELECT 1; SELECT 2", "COPY tickets TO 'out.csv'"])
+def test_sql_box_accepts_only_a_single_select(renderer, sql):
+    at = interactive_view()
+    at.text_area(key="explorer_sql").set_value(sql).run()
+    assert not at.exception
+    assert [error.value for error in at.error][0].startswith("SQL Fehler")
+    assert not os.path.exists("out.csv")
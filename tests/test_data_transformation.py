@@ -0,0 +1,81 @@
+import pandas as pd
+
+from benchmarks.synthetic import generate_issues
+from data_transformation import apply_changes, changed_rows, load_issues, load_issues_parallel, upsert_jira_data
+
+
+def tickets(*rows):
+    df = pd.DataFrame(rows, columns=['key', 'updated', 'status', 'description'])
+    df['updated'] = pd.to_datetime(df['updated'], utc=True)
+    return df
+
+
+def as_records(df):
+    return df.sort_values('key').astype(object).where(df.notna(), None)[['key', 'status', 'description']].values.tolist()
+
+
+STORED = tickets(
+    ('A-1', '2025-12-01 10:00', 'Offen', 'Drucker defekt'),
+    ('A-2', '2025-12-01 10:00', 'Offen', 'Kasse'),
+)
+
+
+def test_newer_fetched_version_replaces_stored_row():
+    df = upsert_jira_data(STORED, tickets(('A-1', '2025-12-02 10:00', 'Fertig', 'Drucker defekt')))
+    assert as_records(df) == [['A-1', 'Fertig', 'Drucker defekt'], ['A-2', 'Offen', 'Kasse']]
+
+
+def test_older_fetched_version_is_ignored():
+    rows, replaced = changed_rows(STORED, tickets(('A-1', '2025-11-30 10:00', 'Fertig', 'alt')))
+    assert len(rows) == 0 and len(replaced) == 0
+    assert as_records(apply_changes(STORED, rows, replaced)) == as_records(STORED)
+
+
+def test_equally_recent_fetched_version_is_skipped():
+    rows, replaced = changed_rows(STORED, tickets(('A-2', '2025-12-01 10:00', 'Offen', 'Kasse')))
+    assert len(rows) == 0 and len(replaced) == 0
+
+
+def test_equally_recent_fetched_version_with_other_fields_is_written():
+    rows, replaced = changed_rows(STORED, tickets(('A-2', '2025-12-01 10:00', 'Fertig', 'Kasse')))
+    assert rows['key'].tolist() == ['A-2'] and replaced.tolist() == [1]
+
+
+def test_most_recent_version_of_a_key_in_the_fetch_wins_whatever_its_position():
+    fetched = tickets(
+        ('A-1', '2025-12-03 10:00', 'Fertig', 'neu'),
+        ('A-1', '2025-12-02 10:00', 'In Arbeit', 'zwischendurch'),
+    )
+    rows, _ = changed_rows(STORED, fetched)
+    assert as_records(rows) == [['A-1', 'Fertig', 'neu']]
+
+
+def test_fields_cleared_in_jira_are_cleared_in_the_store():
+    df = upsert_jira_data(STORED, tickets(('A-1', '2025-12-02 10:00', None, None)))
+    assert as_records(df)[0] == ['A-1', None, None]
+
+
+def test_rows_without_updated_are_written():
+    rows, replaced = changed_rows(STORED, tickets(('A-2', None, 'Fertig', 'Kasse')))
+    assert rows['key'].tolist() == ['A-2'] and replaced.tolist() == [1]
+
+
+def test_new_keys_are_appended_and_other_rows_kept():
+    df = upsert_jira_data(STORED, tickets(('A-3', '2025-12-02 10:00', 'Offen', 'Lizenz')))
+    assert as_records(df) == [['A-1', 'Offen', 'Drucker defekt'], ['A-2', 'Offen', 'Kasse'], ['A-3', 'Offen', 'Lizenz']]
+
+
+def test_upsert_into_an_empty_store_keeps_one_version_per_key():
+    fetched = tickets(('A-1', '2025-12-01 10:00', 'Offen', None), ('A-1', '2025-12-02 10:00', 'Fertig', None))
+    assert as_records(upsert_jira_data(None, fetched)) == [['A-1', 'Fertig', None]]
+
+
+def test_parallel_transform_equals_the_serial_one(workdir):
+    issues = list(generate_issues(100_000, project="SDIPR", seed=3))
+    # any iterable, e.g. an archive replay; the last chunk is a partial one
+    parallel = load_issues_parallel(iter(issues), "IPRO", workers=2, chunk_size=7_000)
+    pd.testing.assert_frame_equal(parallel, load_issues(issues, "IPRO"))
+
+
+def test_parallel_transform_of_nothing_is_an_empty_table(workdir):
+    pd.testing.assert_frame_equal(load_issues_parallel(iter([]), "Amparex", workers=1), load_issues([], "Amparex"))
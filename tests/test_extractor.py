@@ -0,0 +1,102 @@
+import copy
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_issues
+from data_transformation import load_issues, optimize_dtypes
+
+
+def _get(issue, *path, default=''):
+    value = issue
+    try:
+        for step in path:
+            value = value[step]
+    except (KeyError, IndexError, TypeError):
+        return default
+    return value
+
+
+def legacy_load_issues(issues, firma):
+    """The per-issue extractor that load_issues replaced (load_issues / load_issues_Amparex), as reference."""
+    with open('data/object_id_to_name.json') as f:
+        object_id_to_name = json.load(f)
+    rows = []
+    for issue in issues:
+        fields = issue['fields']
+        # both or neither, as in the old try block
+        current = _get(fields, 'customfield_10010', 'currentStatus', default=None)
+        status_name, status_date = _get(current, 'status'), _get(current, 'statusDate', 'jira')
+        if '' in (status_name, status_date):
+            status_name = status_date = ''
+        rows.append({
+            'key': issue['key'],
+            'summary': fields['summary'],
+            'description': fields['description'],
+            'status': fields['status']['name'],
+            'status_category': fields['status']['statusCategory']['name'],
+            'created': fields['created'],
+            'updated': fields['updated'],
+            'labels': fields['labels'],
+            'source': _get(fields, 'customfield_10675', 'value'),
+            'priority': fields['priority']['name'],
+            'category': fields['customfield_10065'],
+            'issuetype': fields['issuetype']['name'],
+            'main_category_id': fields['customfield_10680'][0]['objectId'] if fields['customfield_10680'] else '',
+            'sub_category_id': fields['customfield_10679'][0]['objectId'] if fields['customfield_10679'] else '',
+            'currentstatus_name': status_name,
+            'currentstatus_date': status_date,
+            'comments': '\n\n'.join(c['body'] for c in fields['comment']['comments']),
+            'request_type': _get(fields, 'customfield_10010', 'requestType', 'name'),
+            'clones': _get(fields, 'issuelinks', 0, 'outwardIssue', 'key'),
+            'cloned_by': _get(fields, 'issuelinks', 0, 'inwardIssue', 'key'),
+            'zentrale': "ID_" + str(fields['customfield_10673'][0]['objectId']) if fields['customfield_10673'] else '',
+            'filiale': "ID_" + str(fields['customfield_10674'][0]['objectId']) if fields['customfield_10674'] else '',
+            'Link': _get(fields, 'customfield_10010', '_links', 'agent'),
+        })
+    df = pd.DataFrame(rows)
+    for col in ('created', 'updated', 'currentstatus_date'):
+        df[col] = pd.to_datetime(df[col], errors='coerce', utc=True)
+    df['week_number'] = df['created'].dt.isocalendar().week
+    df['week_string'] = df['created'].dt.strftime('%G-W%V')
+    df['time_to_resolution_h'] = (df['currentstatus_date'] - df['created']).dt.total_seconds() / 3600
+    df['time_to_resolution_days'] = (df['currentstatus_date'] - df['created']).dt.days
+    df['resolution'] = np.where(df['time_to_resolution_days'] <= 1, 'Same day', '> 1 day')
+    df['bdays'] = np.busday_count(df['created'].to_numpy(dtype='datetime64[D]'),
+                                  df['updated'].to_numpy(dtype='datetime64[D]'))
+    df['created_string'] = df['created'].dt.strftime('%Y-%m-%d')
+    df['updated_string'] = df['updated'].dt.strftime('%Y-%m-%d')
+    df['year'] = df['created'].dt.year
+    df['month'] = df['created'].dt.month
+    df['Hauptkategorie'] = df['main_category_id'].map(object_id_to_name)
+    df['Unterkategorie'] = df['sub_category_id'].map(object_id_to_name).fillna('NA')
+    bins = pd.cut(df['time_to_resolution_h'], bins=[0, 1, 2, 4, 8, 24, 48, 72, 7*24, 14*24, 21*24])
+    df['time_to_resolution_bin'] = bins.apply(lambda x: f"{int(x.left)}–{int(x.right)}")
+    df['firma'] = firma
+    return df[['firma', *[col for col in df.columns if col != 'firma']]]
+
+
+def with_edge_cases(issues):
+    edges = copy.deepcopy(issues[:3])
+    # a request type without a current status, a link that is no clone, no customer
+    edges[0]['fields']['customfield_10010'] = {'requestType': {'name': 'Anfrage'}}
+    edges[1]['fields']['issuelinks'] = [{'type': {'name': 'Relates'}}]
+    edges[2]['fields']['customfield_10673'] = []
+    for n, issue in enumerate(edges):
+        issue['key'] = f"{issue['key']}-{n}"
+    return issues + edges
+
+
+@pytest.mark.parametrize("project, firma", [("SDIPR", "IPRO"), ("SDAX", "Amparex")])
+def test_extractor_equals_the_legacy_one(workdir, project, firma):
+    issues = with_edge_cases(list(generate_issues(3000, project=project, seed=4)))
+    # the legacy table with the compact dtypes of the store
+    pd.testing.assert_frame_equal(load_issues(issues, firma), optimize_dtypes(legacy_load_issues(issues, firma)))
+
+
+def test_issue_without_comment_field_has_empty_comments(workdir):
+    issue = next(generate_issues(1, seed=5))
+    issue['fields']['comment'] = None
+    assert load_issues([issue])['comments'].tolist() == ['']
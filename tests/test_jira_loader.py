@@ -0,0 +1,98 @@
+import re
+
+import pandas as pd
+import pytest
+
+import jira_loader
+from benchmarks.synthetic import generate_issues
+from jira_loader import JIRA_TIMEZONE, fetch_tickets
+from raw_archive import iter_raw_issues
+
+JQL = re.compile(r"project = (\w+) AND (\w+) >= '([^']+)' AND \w+ (<=?) '([^']+)' ORDER BY \w+ (ASC|DESC)")
+
+
+class FakeJira:
+    """Answers the paged JQL searches of _search_pages from a list of raw issues."""
+
+    def __init__(self, issues):
+        self.issues = issues
+
+    def enhanced_search_issues(self, jql_str, maxResults, nextPageToken, json_result, **projection):
+        project, field, start, end_op, end, order = JQL.fullmatch(jql_str).groups()
+        start, end = (pd.Timestamp(bound).tz_localize(JIRA_TIMEZONE) for bound in (start, end))
+        matches = []
+        for issue in self.issues:
+            ts = pd.Timestamp(issue['fields'][field])
+            if issue['key'].startswith(project + '-') and start <= ts and (ts <= end if end_op == '<=' else ts < end):
+                matches.append((ts, issue['key'], issue))
+        matches.sort(key=lambda match: match[:2], reverse=order == 'DESC')
+        offset = int(nextPageToken or 0)
+        page = {'issues': [issue for _, _, issue in matches[offset:offset + maxResults]]}
+        if offset + maxResults < len(matches):
+            page['nextPageToken'] = str(offset + maxResults)
+        return page
+
+
+def moved(issue, hours):
+    # the same issue as seen by a later shard, after an update during the fetch
+    fields = dict(issue['fields'])
+    updated = pd.Timestamp(fields['updated']) + pd.Timedelta(hours=hours)
+    return {**issue, 'fields': {**fields, 'updated': updated.strftime('%Y-%m-%dT%H:%M:%S.000%z')}}
+
+
+@pytest.fixture
+def jira(workdir, monkeypatch):
+    ipro = list(generate_issues(600, project="SDIPR", seed=1, days=60))
+    amparex = list(generate_issues(400, project="SDAX", seed=2, days=60))
+    issues = ipro + amparex + [moved(issue, 24 * 30) for issue in ipro[:300:25] + amparex[:200:25]]
+    monkeypatch.setattr(jira_loader, "get_jira_client", lambda: FakeJira(issues))
+    return issues
+
+
+def newest_versions(issues, field):
+    df = pd.DataFrame({'key': [i['key'] for i in issues], field: [pd.Timestamp(i['fields'][field]) for i in issues]})
+    return df.sort_values([field, 'key']).drop_duplicates('key', keep='last')
+
+
+def windows(issues, field):
+    # one window over all issues, for both projects
+    values = [pd.Timestamp(issue['fields'][field]) for issue in issues]
+    window = (min(values) - pd.Timedelta(minutes=1), max(values) + pd.Timedelta(minutes=1))
+    return {project: window for project in jira_loader.PROJECTS}
+
+
+def test_shards_are_merged_to_the_newest_version_of_every_issue(jira):
+    df = fetch_tickets(windows(jira, 'updated'), "updated", max_issues=10_000, shards=4)
+    expected = newest_versions(jira, 'updated')
+    assert sorted(df['key']) == sorted(expected['key'])
+    fetched = df.set_index('key')['updated']
+    assert (fetched[expected['key']].to_numpy() == expected['updated'].to_numpy()).all()
+    # every fetched page is archived
+    assert len(list(iter_raw_issues())) == len(jira)
+
+
+def test_a_truncated_updated_fetch_ends_without_a_gap(jira):
+    df = fetch_tickets(windows(jira, 'updated'), "updated", max_issues=100, shards=4)
+    expected = newest_versions(jira, 'updated')
+    for project, firma in jira_loader.PROJECTS.items():
+        fetched = df[df['firma'] == firma]
+        assert 0 < len(fetched) <= 100
+        assert fetched['updated'].is_monotonic_increasing
+        # all issues up to the newest fetched one, so the watermark skips nothing
+        watermark = fetched['updated'].max()
+        newest = expected[expected['key'].str.startswith(project + '-')].set_index('key')['updated']
+        upto = newest[newest <= watermark]
+        assert set(upto.index) <= set(fetched['key'])
+        # the others are older versions of issues updated after the watermark, the next sync gets them
+        stale = fetched.loc[~fetched['key'].isin(upto.index), 'key']
+        assert (newest[stale] > watermark).all()
+
+
+def test_a_truncated_created_fetch_keeps_the_newest_tickets(jira):
+    df = fetch_tickets(windows(jira, 'created'), "created", max_issues=100, shards=4)
+    expected = newest_versions(jira, 'created')
+    for project, firma in jira_loader.PROJECTS.items():
+        fetched = df[df['firma'] == firma]
+        project_issues = expected[expected['key'].str.startswith(project + '-')]
+        newest = project_issues.sort_values(['created', 'key'], ascending=False).head(100)
+        assert fetched['key'].tolist() == newest['key'].tolist()
@@ -0,0 +1,27 @@
+import pytest
+
+import queries
+from data_loading import sync_lock, upsert_data
+from store_data import transformed
+
+
+@pytest.fixture
+def stored(issues):
+    ipro, _ = issues
+    ipro[0]['fields']['summary'] = "Rabatt 100% falsch"
+    ipro[1]['fields']['summary'] = "Feld kunden_nr leer"
+    with sync_lock():
+        upsert_data(transformed((ipro[:20], "IPRO")))
+
+
+@pytest.mark.parametrize("text, keys", [
+    ("100%", ["SDIPR-100000000"]),
+    ("%", ["SDIPR-100000000"]),
+    ("n_n", ["SDIPR-100000001"]),
+    ("_", ["SDIPR-100000001"]),
+    ("RABATT", ["SDIPR-100000000"]),
+])
+def test_grid_filters_match_the_text_literally(stored, text, keys):
+    page = queries.ticket_page(None, None, None, ['key'], filters=[('summary', text)])
+    assert sorted(page['key']) == keys
+    assert queries.ticket_row_count(None, None, None, filters=[('summary', text)]) == len(keys)
@@ -0,0 +1,38 @@
+from benchmarks.synthetic import generate_issues, generate_updates
+from raw_archive import append_page, compact_runs, iter_raw_issues, list_runs
+
+
+def newest_versions(issues):
+    newest = {}
+    for issue in issues:
+        stored = newest.get(issue["key"])
+        if stored is None or issue["fields"]["updated"] >= stored["fields"]["updated"]:
+            newest[issue["key"]] = issue
+    return newest
+
+
+def test_compaction_keeps_the_newest_runs_and_the_last_version_of_every_issue(workdir):
+    issues = list(generate_issues(60, project="SDIPR", seed=1))
+    updates = [list(generate_updates(issues, 0.5, seed=seed)) for seed in range(2, 6)]
+    runs = [issues[:30], issues[20:], updates[0], updates[1], issues[:10], updates[2], updates[3]]
+    for n, run in enumerate(runs):
+        # two pages per run
+        append_page("SDIPR", f"run{n}", list(run[:5]))
+        append_page("SDIPR", f"run{n}", list(run[5:]))
+    before = newest_versions(iter_raw_issues("SDIPR"))
+
+    assert compact_runs("SDIPR", keep=3) == 4
+    assert [r for _, r in list_runs("SDIPR")] == ["run3", "run4", "run5", "run6"]
+    assert newest_versions(iter_raw_issues("SDIPR")) == before
+    # the merged run holds one version per issue
+    merged = [issue["key"] for issue in iter_raw_issues("SDIPR", "run3")]
+    assert sorted(merged) == sorted(set(merged)) == sorted(issue["key"] for issue in issues)
+
+
+def test_no_compaction_below_twice_the_kept_runs(workdir):
+    issues = list(generate_issues(10, project="SDAX", seed=1))
+    for n in range(6):
+        append_page("SDAX", f"run{n}", issues)
+    assert compact_runs("SDAX", keep=3) == 0
+    assert compact_runs("SDAX", keep=0) == 0
+    assert len(list_runs("SDAX")) == 6
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+import data_loading
+from benchmarks.synthetic import generate_updates
+from data_loading import load_data, save_rollups, sync_lock, upsert_data
+from data_transformation import ROLLUPS
+from store_data import read_rollups, transformed, upsert_in_steps
+
+
+def test_rollups_after_upserts_equal_a_rebuild(issues):
+    upsert_in_steps(*issues)
+    upserted = read_rollups()
+    save_rollups(load_data())
+    rebuilt = read_rollups()
+    for name in ROLLUPS:
+        pd.testing.assert_frame_equal(upserted[name], rebuilt[name])
+
+
+def test_repeating_a_failed_upsert_leaves_correct_rollups(issues, monkeypatch):
+    ipro, amparex = issues
+    upsert_in_steps(ipro, amparex)
+    updates = transformed((generate_updates(ipro, 0.5, seed=7, hours=48), "IPRO"))
+
+    def fail(*args):
+        raise RuntimeError("interrupted")
+
+    with sync_lock():
+        # the partitions are written, the rollups are not
+        with monkeypatch.context() as m:
+            m.setattr(data_loading, "update_rollups", fail)
+            with pytest.raises(RuntimeError):
+                upsert_data(updates)
+        upsert_data(updates)
+    upserted = read_rollups()
+    save_rollups(load_data())
+    rebuilt = read_rollups()
+    for name in ROLLUPS:
+        pd.testing.assert_frame_equal(upserted[name], rebuilt[name])
@@ -0,0 +1,55 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from data_loading import SEARCH_DOCS, SEARCH_TERMS, STORE_DIR, build_search_index
+from search_index import analyze, index_documents, stem
+from store_data import read_search_index, upsert_in_steps
+
+
+@pytest.mark.parametrize("words", [
+    ("drucker", "druckern", "druckers", "druckt"),
+    ("rechnung", "rechnungen"),
+    ("lizenz", "lizenzen"),
+    ("kasse", "kassen"),
+])
+def test_inflected_forms_share_a_stem(words):
+    assert len({stem(word) for word in words}) == 1
+
+
+def test_numbers_codes_and_doubled_letters_are_kept():
+    assert stem("4711") == "4711"
+    assert stem("v2") == "v2"
+    assert stem("kaputt") == "kaputt"
+    assert stem("schein") == "schein"
+
+
+def test_analyze_folds_case_and_umlauts_and_drops_stopwords():
+    assert analyze("Der Drucker druckt nicht, Fehler 4711!") == ["druck", "druck", "fehl", "4711"]
+    assert analyze("Größe Straße") == analyze("groesse strasse") == ["groess", "strass"]
+    assert analyze("Hallo, vielen Dank und freundliche Grüße") == ["freundlich"]
+    assert analyze("Kassen-Abschluss") == ["kass", "abschluss"]
+
+
+def test_index_documents_counts_terms_per_ticket():
+    df = pd.DataFrame({
+        'key': ['A-1', 'A-2'], 'firma': ['IPRO', 'IPRO'], 'created': pd.to_datetime(['2025-12-01', '2025-12-02']),
+        'summary': ['Drucker defekt', 'Kasse'], 'description': ['Der Drucker druckt nicht', None],
+        'comments': [None, None],
+    })
+    postings, docs = index_documents(df)
+    assert postings.values.tolist() == [[stem('defekt'), 'A-1', 1], ['druck', 'A-1', 3], ['kass', 'A-2', 1]]
+    assert docs['length'].tolist() == [4, 1]
+
+
+def test_search_index_after_upserts_equals_a_rebuild(issues):
+    upsert_in_steps(*issues)
+    upserted = read_search_index()
+    for table in (SEARCH_TERMS, SEARCH_DOCS):
+        shutil.rmtree(os.path.join(STORE_DIR, table))
+    build_search_index()
+    rebuilt = read_search_index()
+    for table in (SEARCH_TERMS, SEARCH_DOCS):
+        pd.testing.assert_frame_equal(upserted[table], rebuilt[table], check_categorical=False)
@@ -0,0 +1,85 @@
+import random
+
+import pandas as pd
+import pyarrow as pa
+
+import data_loading
+import queries
+import sync
+from benchmarks.synthetic import generate_updates
+from data_loading import sync_lock, upsert_data
+from snapshot import FIRMA_OFFSETS_KEY, current_version, open_snapshot, publish_snapshot, window_table
+from store_data import transformed, upsert_in_steps
+
+
+def random_window(rnd, first, last):
+    start, end = sorted(first + (last - first) * rnd.uniform(-0.1, 1.1) for _ in range(2))
+    firmas = rnd.choice([None, None, ["IPRO"], ["Amparex"], ["IPRO", "Amparex"], [], ["Unbekannt"]])
+    return (None if rnd.random() < 0.15 else start), (None if rnd.random() < 0.15 else end), firmas
+
+
+def mask_filter(df, start, end, firmas):
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['created'] >= start
+    if end is not None:
+        mask &= df['created'] <= end
+    if firmas is not None:
+        mask &= df['firma'].isin(firmas)
+    return df[mask]
+
+
+def test_window_slices_select_the_same_tickets_as_a_mask_filter(issues):
+    ipro, amparex = issues
+    df = transformed((ipro, "IPRO"), (amparex, "Amparex"))
+    # tickets without a created date sort last within their firma
+    df.loc[df.index[::37], 'created'] = pd.NaT
+    table = open_snapshot(publish_snapshot(pa.Table.from_pandas(df, preserve_index=False)))
+    unsorted = table.replace_schema_metadata({k: v for k, v in table.schema.metadata.items() if k != FIRMA_OFFSETS_KEY})
+    first, last = df['created'].min(), df['created'].max()
+    rnd = random.Random(1)
+    for _ in range(300):
+        start, end, firmas = random_window(rnd, first, last)
+        expected = sorted(mask_filter(df, start, end, firmas)['key'])
+        assert sorted(window_table(table, start, end, firmas).column('key').to_pylist()) == expected
+        # the fallback for snapshots published before the sorted layout
+        assert sorted(window_table(unsorted, start, end, firmas).column('key').to_pylist()) == expected
+
+
+def test_queries_read_the_published_snapshot_during_an_upsert(issues, monkeypatch):
+    ipro, amparex = issues
+    upsert_in_steps(ipro, amparex)
+    version = current_version()
+    before = queries.status_counts(None, None, None, 'created_string', version=version)
+    seen = []
+
+    def check(*args):
+        # the tickets and rollups are written, the snapshot is not published yet
+        seen.append(queries.status_counts(None, None, None, 'created_string', version=version).equals(before))
+        return update_search_index(*args)
+
+    update_search_index = data_loading.update_search_index
+    monkeypatch.setattr(data_loading, "update_search_index", check)
+    with sync_lock():
+        upsert_data(transformed((generate_updates(ipro, 0.5, seed=3), "IPRO")))
+    assert seen == [True]
+    assert current_version() != version
+    assert not queries.status_counts(None, None, None, 'created_string').equals(before)
+
+
+def test_a_cancelled_background_sync_keeps_the_published_snapshot(issues, monkeypatch):
+    ipro, amparex = issues
+    upsert_in_steps(ipro, amparex)
+    version = current_version()
+    job = sync.SyncJob(incremental=True)
+
+    def fetch_updated_tickets(watermarks, max_issues, on_page):
+        job.cancel.set()
+        on_page("SDIPR", 100)
+
+    monkeypatch.setattr(sync, "fetch_updated_tickets", fetch_updated_tickets)
+    job.thread.start()
+    job.thread.join()
+    assert job.state == "cancelled"
+    assert job.progress["pages"] == 1 and job.progress["issues"] == 100
+    assert current_version() == version
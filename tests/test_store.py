@@ -0,0 +1,60 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import data_loading
+from benchmarks.synthetic import generate_updates
+from data_loading import (
+    PENDING_PATH, SEARCH_DOCS, SEARCH_TERMS, STORE_DIR, build_search_index, load_data, load_text, save_rollups,
+    sync_lock, upsert_data,
+)
+from data_transformation import ROLLUPS, TEXT_COLUMNS, split_text_columns
+from snapshot import current_version
+from store_data import read_rollups, read_search_index, transformed, upsert_in_steps
+
+
+def test_refetching_stored_versions_writes_and_publishes_nothing(issues):
+    ipro, amparex = issues
+    upsert_in_steps(ipro, amparex)
+    version = current_version()
+    with sync_lock():
+        # what an incremental sync fetches again in the watermark overlap
+        rows = upsert_data(transformed((ipro[-20:], "IPRO"), (amparex[-20:], "Amparex")))
+    assert len(rows) == 0
+    assert current_version() == version
+
+
+def test_repeating_a_failed_upsert_finishes_its_partitions(issues, monkeypatch):
+    ipro, amparex = issues
+    upsert_in_steps(ipro, amparex)
+    updates = transformed((generate_updates(ipro, 0.5, seed=7, hours=48), "IPRO"))
+
+    def fail(*args):
+        raise RuntimeError("interrupted")
+
+    with sync_lock():
+        # the partitions are written; the rollups, the text and the index are not
+        with monkeypatch.context() as m:
+            m.setattr(data_loading, "update_rollups", fail)
+            with pytest.raises(RuntimeError):
+                upsert_data(updates)
+        # the repeat finds every fetched version stored already
+        assert len(upsert_data(updates)) == 0
+    assert not os.path.exists(PENDING_PATH)
+
+    _, text = split_text_columns(updates)
+    stored_text = load_text(keys=text['key']).set_index('key').loc[text['key'], TEXT_COLUMNS]
+    pd.testing.assert_frame_equal(stored_text.reset_index(drop=True), text[TEXT_COLUMNS].reset_index(drop=True),
+                                  check_dtype=False)
+    upserted_rollups, upserted_index = read_rollups(), read_search_index()
+    save_rollups(load_data())
+    for table in (SEARCH_TERMS, SEARCH_DOCS):
+        shutil.rmtree(os.path.join(STORE_DIR, table))
+    build_search_index()
+    rebuilt_rollups, rebuilt_index = read_rollups(), read_search_index()
+    for name in ROLLUPS:
+        pd.testing.assert_frame_equal(upserted_rollups[name], rebuilt_rollups[name])
+    for table in (SEARCH_TERMS, SEARCH_DOCS):
+        pd.testing.assert_frame_equal(upserted_index[table], rebuilt_index[table], check_categorical=False)